@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import utils.data_etl as data_etl
+from utils.api_manager import parse_total_returns
+from utils.data_etl import HORIZONS, STRATEGIES, ETLManager, set_master_data
+from utils.shared_cache import SharedCache
+from utils.sweep import PAUSE_MULTIPLIERS, SWITCH_MULTIPLIERS, summarize
+from utils.tri_store import TRIStore
+from utils.universe import IndexUniverse, NIFTY_TRI_INDICES
+from utils.xirr import xirr_batch
+from benchmarks.bench_xirr import sip_windows
+from benchmarks.replay import fixture_path, read_fixture, replaying
+from benchmarks.synthetic import payload, synthetic_universe
+
+# Timings of the data and strategy hot paths, written as JSON so runs on different commits
+# can be compared. Runs offline: index data comes from the recorded fixtures or from the
+# synthetic generator. Run from the repository root:
+#   python -m benchmarks.bench_suite
+#   python -m benchmarks.bench_suite --years 50 --indices 100 --output large.json
+#   python -m benchmarks.bench_suite --compare benchmarks/results/<commit>.json
+
+RESULTS = os.path.join(os.path.dirname(__file__), 'results')
+
+YEARS = HORIZONS
+BUILDER_RULES = '''invest 10000 in nifty_smallcap250 when relative_value < 1 + 1σ
+invest 10000 in nifty50 when relative_value > 1 + 2σ
+'''
+
+def measure(run, repeat, setup=None):
+    # setup runs before every repetition and is not timed
+    seconds = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        begin = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - begin)
+    return {'repeat': repeat, 'min': min(seconds), 'median': float(np.median(seconds)), 'mean': float(np.mean(seconds))}
+
+def _clear_results():
+    with data_etl._results_lock:
+        data_etl._results.clear()
+
+def _reset_dir(path):
+    def reset():
+        shutil.rmtree(path, ignore_errors=True)
+    return reset
+
+def parse_benchmarks(args):
+    for name, symbol in NIFTY_TRI_INDICES.items():
+        if os.path.exists(fixture_path(symbol)):
+            content = read_fixture(symbol)
+            yield f'parse/fixture/{name}', {'bytes': len(content), 'rows': len(parse_total_returns(content)[0])}, lambda content=content: parse_total_returns(content), None
+    universe = synthetic_universe(args.years, 2)
+    content = payload(universe.dates, universe.column('nifty50'), 'NIFTY 50')
+    yield 'parse/synthetic', {'bytes': len(content), 'rows': len(universe.dates)}, lambda: parse_total_returns(content), None
+
+def fetch_benchmarks(args, scratch):
+    # Cold start against the replayed API (windowed concurrent fetch, parse, store append and
+    # date join), a cold store filled from the warm shared cache (a restart or a new replica),
+    # then the same load from the warm store
+    names = ['nifty50', 'nifty_smallcap250']
+    symbols = [NIFTY_TRI_INDICES[name] for name in names]
+    if not all(os.path.exists(fixture_path(symbol)) for symbol in symbols):
+        return
+    end_date = min(parse_total_returns(read_fixture(symbol))[0][-1] for symbol in symbols).astype(datetime).strftime('%d-%b-%Y')
+    store_path = os.path.join(scratch, 'tri_store')
+    cache = SharedCache(os.path.join(scratch, 'shared_cache'))
+
+    def load(cache=None):
+        with replaying(cache=cache):
+            IndexUniverse.load(names, end_date=end_date, store=TRIStore(store_path))
+
+    def warm_cache():
+        shutil.rmtree(store_path, ignore_errors=True)
+        if not os.path.exists(cache.path):
+            load(cache)
+            shutil.rmtree(store_path, ignore_errors=True)
+
+    yield 'fetch/replay', {'indices': len(names)}, load, _reset_dir(store_path)
+    yield 'fetch/shared_cache', {'indices': len(names)}, lambda: load(cache), warm_cache
+    yield 'fetch/warm_store', {'indices': len(names)}, load, lambda: os.path.exists(store_path) or load()
+
+def master_benchmarks(args, universe):
+    params = {'rows': len(universe.dates), 'indices': len(universe.names)}
+    yield 'prepare_master_data/build', params, lambda: set_master_data(universe), None
+    set_master_data(universe)
+    etl = ETLManager()
+    yield 'prepare_master_data/warm', params, etl.prepare_master_data, None
+    for frequency in ['weekly', 'daily']:
+        yield f'prepare_master_data/{frequency}', params, lambda frequency=frequency: etl.prepare_master_data(frequency), _clear_results
+
+def returns_benchmarks(args):
+    etl = ETLManager()
+    for strategy in ['nifty50', 'nifty_smallcap250', 'strategy1', 'strategy2']:
+        method = getattr(etl, f'returns_from_{strategy}')
+        for timeperiod in [None, 5, 10]:
+            yield f'returns_from_{strategy}/{timeperiod or "all"}', {'timeperiod': timeperiod}, lambda method=method, timeperiod=timeperiod: method(timeperiod), None
+        yield f'returns_from_{strategy}/daily', {'frequency': 'daily'}, lambda method=method: method(frequency='daily'), _clear_results
+
+def horizon_benchmarks(args, universe):
+    # Every strategy's horizon results from cold derived-result caches, then again for the
+    # same data version
+    etl = ETLManager()
+    params = {'rows': len(universe.dates), 'strategies': len(STRATEGIES)}
+
+    def evaluate():
+        for strategy in STRATEGIES:
+            etl.evaluate_horizons(strategy, YEARS)
+
+    yield 'horizons/cold', params, evaluate, _clear_results
+    yield 'horizons/warm', params, evaluate, None
+
+def monte_carlo_benchmarks(args):
+    # Every strategy over 10k block-bootstrapped 10-year paths, in this process
+    etl = ETLManager()
+    df = etl.prepare_master_data()
+    yield 'monte_carlo/10k', {'paths': 10000, 'years': 10, 'strategies': len(STRATEGIES)}, lambda: etl._monte_carlo(df, STRATEGIES, 10000, 10, 12, 0, 1), None
+
+def xirr_benchmarks(args):
+    for series in [10, 2000]:
+        dates, cashflows, _ = sip_windows(series, int(args.years*12))
+        yield f'xirr/batch_{series}', {'series': series, 'months': len(dates)}, lambda dates=dates, cashflows=cashflows: xirr_batch(dates, cashflows), None
+
+def page_benchmarks(args, scratch):
+    # Everything each page computes, from cold derived-result caches
+    etl = ETLManager()
+    sweep_cache = os.path.join(scratch, 'sweep_cache')
+
+    def home():
+        etl.prepare_master_data()
+
+    def strategy_page(strategy):
+        etl.prepare_master_data()
+        for name in ['nifty50', 'nifty_smallcap250', strategy]:
+            etl.evaluate_horizons(name, YEARS)
+        etl.backtest_summary(etl.rolling_backtest(YEARS, ['nifty50', 'nifty_smallcap250', strategy]))
+
+    def strategy2():
+        strategy_page('strategy2')
+        summarize(etl.threshold_sweep(PAUSE_MULTIPLIERS, SWITCH_MULTIPLIERS, YEARS, args.max_workers, cache_path=sweep_cache), 10)
+
+    def strategy_builder():
+        for name in ['nifty50', 'nifty_smallcap250']:
+            etl.evaluate_horizons(name, YEARS)
+        etl.evaluate_rules(BUILDER_RULES, YEARS)
+
+    def cold():
+        _clear_results()
+        shutil.rmtree(sweep_cache, ignore_errors=True)
+
+    yield 'page/home', {}, home, cold
+    yield 'page/strategy1', {}, lambda: strategy_page('strategy1'), cold
+    yield 'page/strategy2', {'max_workers': args.max_workers}, strategy2, cold
+    yield 'page/strategy_builder', {}, strategy_builder, cold
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    scratch = tempfile.mkdtemp(prefix='bench_suite_')
+    try:
+        if args.data == 'fixtures':
+            with replaying():
+                universe = IndexUniverse.load(['nifty50', 'nifty_smallcap250'], store=TRIStore(os.path.join(scratch, 'fixture_store')))
+        else:
+            universe = synthetic_universe(args.years, args.indices)
+        groups = [parse_benchmarks(args), fetch_benchmarks(args, scratch), master_benchmarks(args, universe),
+                  returns_benchmarks(args), horizon_benchmarks(args, universe), monte_carlo_benchmarks(args), xirr_benchmarks(args), page_benchmarks(args, scratch)]
+        results = {}
+        for group in groups:
+            for name, params, benchmark, setup in group:
+                if args.only and not any(name.startswith(prefix) for prefix in args.only):
+                    continue
+                results[name] = dict(params, **measure(benchmark, args.repeat, setup))
+                print(f"{name:<45} {results[name]['median']*1000:10.2f} ms")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return {
+        'commit': _commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'data': args.data,
+        'years': args.years,
+        'indices': args.indices,
+        'rows': len(universe.dates),
+        'results': results,
+    }
+
+def compare(report, baseline, threshold):
+    # Median time ratio of every benchmark present in both runs; True when none regressed
+    regressed = False
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        ratio = result['median'] / baseline['results'][name]['median']
+        flag = 'REGRESSION' if ratio > threshold else ''
+        regressed |= ratio > threshold
+        print(f'{name:<45} {ratio:6.2f}x {flag}')
+    return not regressed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the TRI data and strategy hot paths')
+    parser.add_argument('--data', choices=['synthetic', 'fixtures'], default='synthetic', help='index data behind the ETL and page benchmarks')
+    parser.add_argument('--years', type=float, default=20, help='length of the synthetic daily history')
+    parser.add_argument('--indices', type=int, default=2, help='number of synthetic indices')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-workers', type=int, default=1, help='processes for the threshold sweep')
+    parser.add_argument('--only', nargs='+', help='run only benchmarks whose name starts with one of these')
+    parser.add_argument('--output', help=f'JSON report path (default {RESULTS}/<commit>.json)')
+    parser.add_argument('--compare', help='earlier JSON report to compare median times against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or os.path.join(RESULTS, f"{report['commit'] or 'report'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'Wrote {output}')
+    if args.compare:
+        with open(args.compare) as file:
+            if not compare(report, json.load(file), args.threshold):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+import time
+import numpy as np
+from pyxirr import xirr
+from utils.xirr import xirr_batch
+
+# Batched XIRR against a per-series pyxirr loop on synthetic monthly SIP windows.
+# Run from the repository root: python -m benchmarks.bench_xirr
+
+def sip_windows(series=2000, months=240, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = (np.datetime64('2005-04', 'M') + np.arange(months)).astype('datetime64[D]') + rng.integers(0, 4, months)
+    cashflows = np.where(rng.random((series, months)) < 0.7, 10000.0, 0.0)
+    starts = rng.integers(0, months - 12, series)
+    cashflows[np.arange(months) < starts[:, None]] = 0.0
+    cashflows[:, -1] -= cashflows.sum(axis=1) * np.exp(rng.normal(0.3, 0.5, series))
+    return dates, cashflows, starts
+
+def run(series=2000, months=240):
+    dates, cashflows, starts = sip_windows(series, months)
+    begin = time.perf_counter()
+    batched = xirr_batch(dates, cashflows)
+    batch_seconds = time.perf_counter() - begin
+    begin = time.perf_counter()
+    looped = np.array([xirr(dates[start:], row[start:]) for start, row in zip(starts, cashflows)], dtype=np.float64)
+    loop_seconds = time.perf_counter() - begin
+    solved = ~np.isnan(looped)
+    return {
+        'series': series,
+        'months': months,
+        'batch_seconds': batch_seconds,
+        'loop_seconds': loop_seconds,
+        'max_abs_diff': float(np.max(np.abs(batched[solved] - looped[solved]))),
+    }
+
+if __name__ == '__main__':
+    for series in [10, 200, 2000]:
+        result = run(series)
+        assert result['max_abs_diff'] < 1e-8, result
+        print(result)
@@ -0,0 +1,49 @@
+import argparse
+import json
+from datetime import datetime
+from benchmarks.replay import FIXTURES, write_fixture
+from benchmarks.synthetic import payload, synthetic_universe
+from utils.api_manager import NIFTYIndices
+from utils.universe import NIFTY_TRI_INDICES
+
+# Record the niftyindices responses the benchmarks replay. Run from the repository root:
+#   python -m benchmarks.record_fixtures                 # record from niftyindices.com
+#   python -m benchmarks.record_fixtures --synthetic     # write synthetic stand-ins offline
+
+def record(symbol, start_date, end_date):
+    # Fetch the history window by window, as the app does, and keep the raw records
+    api = NIFTYIndices('NIFTYINDEXTRI')
+    records = {}
+    for window_start, window_end in api._windows(start_date, end_date):
+        data = {"cinfo": f"{{'name':'{symbol}','startDate':'{window_start}','endDate':'{window_end}','indexName':'{symbol}'}}"}
+        response = api.pooled_session().post(api.url, headers=api.header, json=data, timeout=api.timeout)
+        response.raise_for_status()
+        for record in json.loads(response.json()['d']):
+            records.setdefault(record['Date'], record)
+    ordered = sorted(records.values(), key=lambda record: datetime.strptime(record['Date'], '%d %b %Y'))
+    return json.dumps({'d': json.dumps(ordered)}).encode()
+
+def main():
+    parser = argparse.ArgumentParser(description='Record niftyindices TRI fixtures for the benchmarks')
+    parser.add_argument('--indices', nargs='+', default=['nifty50', 'nifty_smallcap250'], choices=list(NIFTY_TRI_INDICES))
+    parser.add_argument('--start-date', default='01-Apr-2005')
+    parser.add_argument('--end-date', default=datetime.today().strftime('%d-%b-%Y'))
+    parser.add_argument('--synthetic', action='store_true', help='write synthetic histories in the recorded wire format instead')
+    parser.add_argument('--fixtures', default=FIXTURES)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        start = datetime.strptime(args.start_date, '%d-%b-%Y')
+        years = (datetime.strptime(args.end_date, '%d-%b-%Y') - start).days / 365.25
+        universe = synthetic_universe(years, len(NIFTY_TRI_INDICES), start.strftime('%Y-%m-%d'))
+    for name in args.indices:
+        symbol = NIFTY_TRI_INDICES[name]
+        if args.synthetic:
+            content = payload(universe.dates, universe.column(name), symbol)
+        else:
+            content = record(symbol, args.start_date, args.end_date)
+        write_fixture(symbol, content, args.fixtures)
+        print(f'{symbol}: {len(content):,} bytes')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import gzip
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+import numpy as np
+import requests
+from requests.adapters import BaseAdapter
+from utils.api_manager import NIFTYIndices, parse_total_returns
+from utils.shared_cache import SharedCache, set_shared_cache
+
+# Offline stand-in for niftyindices.com. Each fixture is one recorded TotalReturnsIndex
+# response body covering the whole history of an index, stored gzipped as
+# fixtures/<symbol slug>.json.gz; a request for any date window is answered with the
+# recorded records that fall inside it, in the same wire format.
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+_CINFO_PATTERN = re.compile(r"'(\w+)'\s*:\s*'([^']*)'")
+
+def fixture_path(symbol, fixtures=FIXTURES):
+    return os.path.join(fixtures, symbol.replace(' ', '_').lower() + '.json.gz')
+
+def read_fixture(symbol, fixtures=FIXTURES):
+    with gzip.open(fixture_path(symbol, fixtures), 'rb') as file:
+        return file.read()
+
+def write_fixture(symbol, content, fixtures=FIXTURES):
+    os.makedirs(fixtures, exist_ok=True)
+    with gzip.GzipFile(fixture_path(symbol, fixtures), 'wb', mtime=0) as file:
+        file.write(content)
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, fixtures=FIXTURES):
+        super().__init__()
+        self.fixtures = fixtures
+        self._records = {}
+
+    def _history(self, symbol):
+        if symbol not in self._records:
+            content = read_fixture(symbol, self.fixtures)
+            self._records[symbol] = (json.loads(json.loads(content)['d']), parse_total_returns(content)[0])
+        return self._records[symbol]
+
+    def send(self, request, **kwargs):
+        cinfo = dict(_CINFO_PATTERN.findall(json.loads(request.body)['cinfo']))
+        response = requests.Response()
+        response.request, response.url = request, request.url
+        try:
+            records, dates = self._history(cinfo['name'])
+        except FileNotFoundError:
+            response.status_code, response._content = 404, b''
+            return response
+        start, end = (np.datetime64(datetime.strptime(cinfo[key], '%d-%b-%Y').date()) for key in ('startDate', 'endDate'))
+        window = np.flatnonzero((dates >= start) & (dates <= end))
+        response.status_code = 200
+        response._content = json.dumps({'d': json.dumps([records[i] for i in window])}).encode()
+        response.headers['Content-Type'] = 'application/json; charset=utf-8'
+        return response
+
+    def close(self):
+        pass
+
+def replay_session(fixtures=FIXTURES):
+    session = requests.Session()
+    adapter = ReplayAdapter(fixtures)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class replaying:
+    # Route every NIFTYIndices fetch over the pooled session to the fixtures while active.
+    # Replayed responses go to the given shared cache, by default a throwaway one, never to the
+    # host-wide cache the app reads.
+    def __init__(self, fixtures=FIXTURES, cache=None):
+        self.session = replay_session(fixtures)
+        self.cache = cache
+
+    def __enter__(self):
+        self._scratch = None if self.cache is not None else tempfile.mkdtemp(prefix='replay_cache_')
+        self._previous_cache = set_shared_cache(self.cache or SharedCache(self._scratch))
+        with NIFTYIndices._session_lock:
+            self._previous, NIFTYIndices._session = NIFTYIndices._session, self.session
+        return self.session
+
+    def __exit__(self, *exc_info):
+        with NIFTYIndices._session_lock:
+            NIFTYIndices._session = self._previous
+        set_shared_cache(self._previous_cache)
+        if self._scratch:
+            shutil.rmtree(self._scratch, ignore_errors=True)
@@ -0,0 +1,34 @@
+import json
+import numpy as np
+import pandas as pd
+from utils.universe import IndexUniverse, NIFTY_TRI_INDICES
+
+# Synthetic daily TRI histories for benchmarks: business days from start_date, with every
+# index following a geometric random walk driven by one shared market factor plus its own
+# noise, so the relative value of any two indices wanders the way the real series do.
+
+def index_names(indices):
+    known = ['nifty50', 'nifty_smallcap250'] + [name for name in NIFTY_TRI_INDICES if name not in ('nifty50', 'nifty_smallcap250')]
+    return (known + [f'synthetic_{i:03d}' for i in range(len(known), indices)])[:indices]
+
+def synthetic_universe(years=20, indices=2, start_date='2005-04-01', seed=7):
+    # The first indices carry the niftyindices column names, so the app's own strategies run
+    # on the result unchanged. Index 0 is nifty50 and index 1 is nifty_smallcap250.
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods=int(years*261)).to_numpy(dtype='datetime64[D]')
+    names = index_names(max(indices, 2))
+    indices = len(names)
+    beta = np.concatenate([[1.0, 1.3], rng.uniform(0.8, 1.4, max(indices - 2, 0))])[:indices]
+    drift = np.concatenate([[0.00045, 0.0005], rng.uniform(0.0003, 0.0006, max(indices - 2, 0))])[:indices]
+    market = rng.normal(0, 0.009, (len(dates), 1))
+    log_returns = drift + beta*market + rng.normal(0, 0.006, (len(dates), indices))
+    log_returns[0] = 0
+    tri = 1000*np.exp(np.cumsum(log_returns, axis=0))
+    return IndexUniverse(dates, np.round(tri, 2), names)
+
+def payload(dates, tri, index_name):
+    # A niftyindices TotalReturnsIndex response body: a JSON string of records wrapped in {"d": ...}
+    day = pd.DatetimeIndex(np.asarray(dates, dtype='datetime64[ns]')).strftime('%d %b %Y')
+    records = [{'RequestNumber': 'History' + index_name, 'Index Name': index_name, 'INDEX_NAME': index_name,
+                'Date': date, 'TotalReturnsIndex': f'{value:.2f}'} for date, value in zip(day, tri)]
+    return json.dumps({'d': json.dumps(records)}).encode()
@@ -1,11 +1,11 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 
-from utils.data_etl import ETLManager
+from utils import metrics, warmup
+from utils.figures import RELATIVE_VALUE_CHARTS, plotly_chart, relative_value_chart
 from router import sidebar_menu
 
 # Code for the GUI of the app goes here
+@metrics.timed('page.home')
 def run_UI():
     st.markdown('''
     #### :violet[Background]
@@ -42,34 +42,15 @@ def run_UI():
     The ratio of the returns from the NIFTY SMALLCAP 250 TRI and NIFTY 50 TRI from April 2005 is represented in the chart below.
     ''')
     
-    df = ETLManager().prepare_master_data()
-    fig = px.line(df, x='date', y='relative_value', color_discrete_sequence=["purple"])
-    fig.update_layout(xaxis_title='', yaxis_title=' Ratio of the indices')
-    fig.update_traces(mode="lines", hovertemplate = "Date: %{x} <br>Ratio: %{y:.2f}", xhoverformat="%b %d, %Y")
-    fig.update_layout(hovermode="x unified")
-    fig.update_xaxes(dtick='M24', tickformat='%Y', ticklabelmode='period')
-    st.plotly_chart(fig, use_container_width=True)
+    warmup.placeholder()
+    plotly_chart(relative_value_chart(**RELATIVE_VALUE_CHARTS['ratio']))
 
     st.markdown('''
     The chart below highlights the regions within ±1σ, ±2σ, and ±3σ of the ratio of relative change of the indices. Based on which, we shall
     try to formulate certain investment strategies.
     ''')
     
-    std_dev = df['relative_value'].std()
-    fig2 = px.line(df, x='date', y='relative_value', color_discrete_sequence=["purple"])
-    fig2.update_layout(xaxis_title='', yaxis_title=' Variation of the indices')
-    fig2.update_layout(yaxis=dict(
-        tickmode='array', 
-        ticktext=['- 3σ','- 2σ','- 1σ', '1', '+ 1σ','+ 2σ','+ 3σ'], 
-        tickvals=[1-3*std_dev, 1-2*std_dev, 1-std_dev, 1, 1+std_dev, 1+2*std_dev, 1+3*std_dev])
-    )
-    fig2.update_traces(mode="lines", hovertemplate = "Date: %{x} <br>Ratio: %{y:.2f}", xhoverformat="%b %d, %Y")
-    fig2.update_layout(hovermode="x unified")
-    fig2.add_shape(type="rect", x0=df['date'].min(), x1=df['date'].max(), y0=1-std_dev, y1=1+std_dev,fillcolor="blue", opacity=0.15, line_width=1)
-    fig2.add_shape(type="rect", x0=df['date'].min(), x1=df['date'].max(), y0=1-2*std_dev, y1=1+2*std_dev,fillcolor="blue", opacity=0.1, line_width=1)
-    fig2.add_shape(type="rect", x0=df['date'].min(), x1=df['date'].max(), y0=1-3*std_dev, y1=1+3*std_dev,fillcolor="blue", opacity=0.05, line_width=1)
-    fig2.update_xaxes(dtick='M24', tickformat='%Y', ticklabelmode='period')
-    st.plotly_chart(fig2, use_container_width=True)
+    plotly_chart(relative_value_chart(**RELATIVE_VALUE_CHARTS['bands']))
 
     # Navigation to Next Page Logic
     st.columns(3)[1].page_link("pages/strategy1.py", label='Navigate to Strategy 1', icon="♟️")
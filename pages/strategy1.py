@@ -1,11 +1,38 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from utils.data_etl import ETLManager
+from utils import metrics
+from utils import warmup
+from utils.sip_engine import SIP_AMOUNT
+from utils.figures import RELATIVE_VALUE_CHARTS, backtest_box, horizon_bars, plotly_chart, relative_value_chart, strategy_series
+from utils.sweep import PAUSE_MULTIPLIERS
 
-from pyxirr import xirr 
-from router import sidebar_menu
+from router import fragment, sidebar_menu
 
+@fragment
+@metrics.timed('page.strategy1.returns')
+def estimation_of_returns(series):
+    from utils.data_etl import HORIZONS, default_thresholds
+    amount = st.slider('Monthly SIP (INR)', min_value=1000, max_value=100000, value=SIP_AMOUNT, step=1000)
+    pause = st.select_slider('Pause above 1 + kσ', PAUSE_MULTIPLIERS, value=default_thresholds('strategy1')[0])
+    thresholds = {'strategy1': (pause,)}
+    years = sorted(st.multiselect('Horizons', HORIZONS, default=HORIZONS, format_func=lambda year: f'{year} years'))
+    if not years:
+        st.info('Pick at least one horizon.')
+        return
+    warmup.placeholder('figures', 'Computing the returns...')
+
+    st.markdown('''
+    ###### :violet[Amount Invested]
+    ''')
+
+    plotly_chart(horizon_bars(series, years, 'invested', amount, thresholds))
+
+    st.markdown('''
+    ###### :violet[XIRR]
+    ''')
+
+    plotly_chart(horizon_bars(series, years, 'xirr', amount, thresholds))
+
+@metrics.timed('page.strategy1')
 def run_UI():
     st.markdown('''
     #### :violet[Strategy 1: Invest + Pause]
@@ -20,21 +47,10 @@ def run_UI():
     avoid buying units at a higher cost.
     ''')
     
-    df = ETLManager().prepare_master_data()
-    std_dev = df['relative_value'].std()
-    fig1 = px.line(df, x='date', y='relative_value', color_discrete_sequence=["purple"])
-    fig1.update_layout(xaxis_title='', yaxis_title=' Variation of the indices')
-    fig1.update_layout(yaxis=dict(
-        tickmode='array', 
-        ticktext=['...', '1', '+ 1σ','...'], 
-        tickvals=[df['relative_value'].min(), 1, 1+1*std_dev, df['relative_value'].max()]
-    ))
-    fig1.update_traces(mode="lines", hovertemplate = "Date: %{x} <br>Ratio: %{y:.2f}", xhoverformat="%b %d, %Y")
-    fig1.update_layout(hovermode="x unified")
-    fig1.add_shape(type="rect", x0=df['date'].min(), x1=df['date'].max(), y0=df['relative_value'].min(), y1=1+1*std_dev,fillcolor="seagreen", opacity=0.2, line_width=1, label=dict(text="INVEST", textposition="middle center", font=dict(size=20)))
-    fig1.add_shape(type="rect", x0=df['date'].min(), x1=df['date'].max(), y0=1+1*std_dev, y1=df['relative_value'].max(),fillcolor="maroon", opacity=0.1, line_width=1, label=dict(text="PAUSE", textposition="middle center", font=dict(size=20)))
-    fig1.update_xaxes(dtick='M24', tickformat='%Y', ticklabelmode='period')
-    st.plotly_chart(fig1, use_container_width=True)
+    from utils.data_etl import HORIZONS, ETLManager
+    warmup.placeholder()
+    etl = ETLManager()
+    plotly_chart(relative_value_chart(**RELATIVE_VALUE_CHARTS['strategy1']))
 
     st.markdown('''
     #### :violet[Estimation of Returns]
@@ -42,71 +58,44 @@ def run_UI():
 
     st.markdown('''
     Let us compare the returns using this strategy vis-à-vis investing in the NIFTY 50 and NIFTY Smallcap 250. For the sake of simplicity,
-    we shall calculate the returns assuming an SIP of INR 10,000 made on a monthly basis.
+    we shall calculate the returns assuming an SIP of INR 10,000 made on a monthly basis. Change the amount, the thresholds or the
+    horizons below to see how the comparison moves.
     ''')
 
     ## Calculation of returns
 
-    years = [3, 5, 7, 10, 12, 15]
-    largecap_returns = []
-    smallcap_returns = []
-    strategy1_returns = []
-    largecap_inv = []
-    smallcap_inv = []
-    strategy1_inv = []
-    for _, elt in enumerate(years):
-        largecap = ETLManager().returns_from_nifty50(elt)
-        smallcap = ETLManager().returns_from_nifty_smallcap250(elt)
-        strategy1 = ETLManager().returns_from_strategy1(elt)
-        largecap_returns.append(round(xirr(largecap)*100,1))
-        smallcap_returns.append(round(xirr(smallcap)*100,1))
-        strategy1_returns.append(round(xirr(strategy1)*100,1))
-        largecap_inv.append(largecap.iloc[:-1]['cashflow'].sum())
-        smallcap_inv.append(smallcap.iloc[:-1]['cashflow'].sum())
-        strategy1_inv.append(strategy1.iloc[:-1]['cashflow'].sum())
-
+    years = HORIZONS
+    series = strategy_series('strategy1')
+    estimation_of_returns(series)
+    
     st.markdown('''
-    ###### :violet[Amount Invested]
+    #### :violet[Rolling-start Backtest]
     ''')
 
-    fig2 = go.Figure(data=[
-        go.Bar(name='Nifty 50', x=years, y=largecap_inv, marker_color='grey'),
-        go.Bar(name='Nifty Smallcap 250', x=years, y=smallcap_inv, marker_color='lightslategray'),
-        go.Bar(name='Strategy 2', x=years, y=strategy1_inv, marker_color='palevioletred')
-        
-    ])
-    fig2.update_layout(barmode='group')
-    x_vals = ['3 years','5 years','7 years', '10 years', '12 years','15 years']
-    fig2.update_layout(xaxis=dict(
-        tickmode='array', 
-        ticktext=x_vals, 
-        tickvals=years)
-    )
-    fig2.update_layout(bargroupgap=0.2)
-    fig2.update_layout(legend = {"orientation": "h", "xanchor": "center", "x": 0.5})
-    st.plotly_chart(fig2, use_container_width=True)
-
     st.markdown('''
-    ###### :violet[XIRR]
+    The returns above depend on a single start date for each horizon. The chart below repeats the comparison for every
+    possible start month, showing the spread of XIRR across all start dates and how often each approach beat
+    the NIFTY Smallcap 250 over the same window.
     ''')
 
-    fig2 = go.Figure(data=[
-        go.Bar(name='Nifty 50', x=years, y=largecap_returns, marker_color='grey'),
-        go.Bar(name='Nifty Smallcap 250', x=years, y=smallcap_returns, marker_color='lightslategray'),
-        go.Bar(name='Strategy 2', x=years, y=strategy1_returns, marker_color='palevioletred')
-        
-    ])
-    fig2.update_layout(barmode='group')
-    x_vals = ['3 years','5 years','7 years', '10 years', '12 years','15 years']
-    fig2.update_layout(xaxis=dict(
-        tickmode='array', 
-        ticktext=x_vals, 
-        tickvals=years)
-    )
-    fig2.update_layout(bargroupgap=0.2)
-    fig2.update_layout(legend = {"orientation": "h", "xanchor": "center", "x": 0.5})
-    st.plotly_chart(fig2, use_container_width=True)
-    
+    labels = {strategy: name for strategy, name, _ in series}
+    warmup.placeholder('backtest', 'Running the backtest over every start month...')
+    backtest = etl.rolling_backtest(years, list(labels))
+    summary = etl.backtest_summary(backtest)
+    plotly_chart(backtest_box(labels, years, [color for _, _, color in series]))
+
+    summary['strategy'] = summary['strategy'].map(labels)
+    summary[['p10', 'p25', 'median', 'p75', 'p90', 'win_rate']] *= 100
+    st.dataframe(summary, hide_index=True, use_container_width=True, column_config={
+        'strategy': 'Strategy', 'horizon': 'Years', 'starts': 'Start months',
+        'p10': st.column_config.NumberColumn('P10 XIRR', format='%.1f%%'),
+        'p25': st.column_config.NumberColumn('P25 XIRR', format='%.1f%%'),
+        'median': st.column_config.NumberColumn('Median XIRR', format='%.1f%%'),
+        'p75': st.column_config.NumberColumn('P75 XIRR', format='%.1f%%'),
+        'p90': st.column_config.NumberColumn('P90 XIRR', format='%.1f%%'),
+        'win_rate': st.column_config.NumberColumn('Beat Smallcap 250', format='%.0f%%'),
+    })
+
     # Navigation to Next Page Logic
     _, middle, _ = st.columns(3)
     if middle.button("Navigate to Strategy 2", use_container_width=True):
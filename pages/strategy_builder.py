@@ -0,0 +1,97 @@
+import streamlit as st
+from utils import metrics, warmup
+from utils.strategy_rules import RuleError, parse_rules
+
+from router import sidebar_menu
+
+DEFAULT_RULES = '''# Strategy 2 written as rules
+invest 10000 in nifty_smallcap250 when relative_value < 1 + 1σ
+invest 10000 in nifty50 when relative_value > 1 + 2σ
+'''
+
+@metrics.timed('page.strategy_builder')
+def run_UI():
+    import plotly.graph_objects as go
+    from utils.data_etl import PERIODS_PER_YEAR, ETLManager
+
+    st.markdown('''
+    #### :violet[Strategy Builder]
+    ''')
+
+    st.markdown('''
+    Write your own strategy as a set of rules, one per line. Each rule is a separate SIP into the chosen index that
+    runs only in the periods where its condition holds -
+    1. `invest <amount> in <index>` invests every period. The index is `nifty50` or `nifty_smallcap250`.
+    2. `... when relative_value < 1 + 1σ` invests only while the variation of the indices is below +1σ. Bounds can be
+    numbers (`0.9`) or sigma bands (`1 - 0.5σ`, or `2σ` for `1 + 2σ` as the charts label it), and comparisons can be
+    combined with `and` / `or`.
+
+    As on the strategy pages, the first rule starts every horizon with one instalment already invested and the other
+    rules start empty, so the default rules below give exactly the returns of Strategy 2.
+    ''')
+
+    rules_text = st.text_area('Rules', DEFAULT_RULES, height=150)
+    frequency_options = {'monthly': 'Monthly', 'weekly': 'Weekly', 'daily': 'Daily', 10: '10th of the month'}
+    frequency = st.radio('Invest', list(frequency_options), format_func=frequency_options.get, horizontal=True,
+        help='Each SIP instalment is invested on the first trading day of the period.')
+    # Trailing σ windows count periods at the SIP frequency; a day of the month is a monthly SIP
+    periods = PERIODS_PER_YEAR.get(frequency, 12)
+    sigma_options = {'full': 'Full history', 'expanding': 'Expanding (no look-ahead)', 3*periods: 'Trailing 3 years', 5*periods: 'Trailing 5 years'}
+    sigma = st.radio('Estimate σ from', list(sigma_options), format_func=sigma_options.get, horizontal=True,
+        help='Full history uses months after each investment decision. The other options only use data available at the time.')
+    try:
+        rules = parse_rules(rules_text)
+    except RuleError as e:
+        st.error(str(e))
+        return
+
+    years = [3, 5, 7, 10, 12, 15]
+    warmup.placeholder()
+    etl = ETLManager()
+    largecap = etl.evaluate_horizons('nifty50', years, frequency=frequency)
+    smallcap = etl.evaluate_horizons('nifty_smallcap250', years, frequency=frequency)
+    custom = etl.evaluate_rules(rules, years, sigma, frequency)
+    x_vals = ['3 years','5 years','7 years', '10 years', '12 years','15 years']
+
+    st.markdown('''
+    ###### :violet[Amount Invested]
+    ''')
+
+    with metrics.span('page.strategy_builder.figures'):
+        fig1 = go.Figure(data=[
+            go.Bar(name='Nifty 50', x=years, y=largecap['invested'], marker_color='grey'),
+            go.Bar(name='Nifty Smallcap 250', x=years, y=smallcap['invested'], marker_color='lightslategray'),
+            go.Bar(name='Your Strategy', x=years, y=custom['invested'], marker_color='palevioletred')
+        ])
+        fig1.update_layout(barmode='group')
+        fig1.update_layout(xaxis=dict(
+            tickmode='array',
+            ticktext=x_vals,
+            tickvals=years)
+        )
+        fig1.update_layout(bargroupgap=0.2)
+        fig1.update_layout(legend = {"orientation": "h", "xanchor": "center", "x": 0.5})
+        st.plotly_chart(fig1, use_container_width=True)
+
+    st.markdown('''
+    ###### :violet[XIRR]
+    ''')
+
+    with metrics.span('page.strategy_builder.figures'):
+        fig2 = go.Figure(data=[
+            go.Bar(name='Nifty 50', x=years, y=(largecap['xirr']*100).round(1), marker_color='grey'),
+            go.Bar(name='Nifty Smallcap 250', x=years, y=(smallcap['xirr']*100).round(1), marker_color='lightslategray'),
+            go.Bar(name='Your Strategy', x=years, y=(custom['xirr']*100).round(1), marker_color='palevioletred')
+        ])
+        fig2.update_layout(barmode='group')
+        fig2.update_layout(xaxis=dict(
+            tickmode='array',
+            ticktext=x_vals,
+            tickvals=years)
+        )
+        fig2.update_layout(bargroupgap=0.2)
+        fig2.update_layout(legend = {"orientation": "h", "xanchor": "center", "x": 0.5})
+        st.plotly_chart(fig2, use_container_width=True)
+
+sidebar_menu()
+run_UI()
@@ -0,0 +1,68 @@
+import streamlit as st
+from utils import metrics
+from utils import warmup
+from utils.figures import plotly_chart, simulation_box
+
+from router import sidebar_menu
+
+@metrics.timed('page.stress_test')
+def run_UI():
+    from utils.data_etl import HORIZONS, ETLManager
+    st.markdown('''
+    #### :violet[Stress Test]
+    ''')
+
+    st.markdown('''
+    The returns on the other pages come from the one path the indices actually took. This page generates thousands of
+    alternative futures by reshuffling blocks of consecutive months from the history of the NIFTY 50 and NIFTY Smallcap 250,
+    keeping both indices' returns for the same months together. Every path starts from today's variation of the indices,
+    and each strategy is run on every path with the σ bands of the full history.
+    ''')
+
+    years = st.radio('Horizon', HORIZONS, index=HORIZONS.index(10), horizontal=True, format_func=lambda year: f'{year} years')
+    block_options = {3: '3 months', 12: '1 year', 24: '2 years', 36: '3 years'}
+    block_months = st.radio('Block length', list(block_options), index=1, format_func=block_options.get, horizontal=True,
+        help='Longer blocks keep more of the momentum and mean reversion of the indices, shorter blocks give more varied paths.')
+    paths = st.radio('Paths', [1000, 10000, 50000], index=1, format_func=lambda count: f'{count:,}', horizontal=True)
+    seed = st.number_input('Seed', min_value=0, value=0, step=1, help='The same seed always gives the same paths.')
+
+    warmup.placeholder()
+    series = [('nifty50', 'Nifty 50', 'grey'), ('nifty_smallcap250', 'Nifty Smallcap 250', 'lightslategray'),
+              ('strategy1', 'Strategy 1', 'mediumpurple'), ('strategy2', 'Strategy 2', 'palevioletred')]
+    etl = ETLManager()
+    with st.spinner(f'Simulating {paths:,} paths...'):
+        simulation = etl.monte_carlo([strategy for strategy, _, _ in series], paths, years, block_months, int(seed))
+
+    st.markdown('''
+    ###### :violet[XIRR]
+    ''')
+
+    plotly_chart(simulation_box(series, 'xirr', paths, years, block_months, int(seed)))
+
+    st.markdown('''
+    ###### :violet[Maximum Drawdown]
+    ''')
+
+    st.markdown('''
+    The largest fall of the portfolio value from its previous high within the horizon.
+    ''')
+
+    plotly_chart(simulation_box(series, 'max_drawdown', paths, years, block_months, int(seed)))
+
+    summary = etl.monte_carlo_summary(simulation)
+    summary['strategy'] = summary['strategy'].map({strategy: name for strategy, name, _ in series})
+    column_config = {
+        'strategy': 'Strategy', 'paths': 'Paths',
+        'invested': st.column_config.NumberColumn('Avg. invested', format='₹%.0f'),
+        'loss_rate': st.column_config.NumberColumn('Lost money', format='%.1f%%'),
+        'win_rate': st.column_config.NumberColumn('Beat Smallcap 250', format='%.0f%%'),
+    }
+    for name, label in [('xirr', 'XIRR'), ('max_drawdown', 'Drawdown')]:
+        for percentile in [5, 25, 50, 75, 95]:
+            column_config[f'{name}_p{percentile}'] = st.column_config.NumberColumn(f'{label} P{percentile}', format='%.1f%%')
+    percent = [column for column in column_config if column not in ('strategy', 'paths', 'invested')]
+    summary[percent] *= 100
+    st.dataframe(summary, hide_index=True, use_container_width=True, column_config=column_config)
+
+sidebar_menu()
+run_UI()
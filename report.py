@@ -0,0 +1,124 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+from utils.data_etl import HORIZONS, STRATEGIES, ETLManager, load_universe, set_master_data
+from utils.strategy_rules import RuleError, parse_rules
+from utils.universe import IndexUniverse
+
+# Headless report runner for scheduled jobs: the strategy pages' numbers for every strategy,
+# sigma estimate, SIP frequency and horizon, written as CSV and/or Parquet. The master data is
+# loaded once and handed to every worker, which runs the same ETLManager code as the pages.
+#   python report.py --output reports/
+#   python report.py --sigma full expanding 60 --frequency monthly weekly --rules my_rules.txt --format parquet
+
+def _init_worker(as_of, dates, tri, names):
+    set_master_data(IndexUniverse(dates, tri, names), as_of)
+
+def _run_job(job):
+    kind, name, sigma, frequency, horizons, rules = job
+    etl = ETLManager()
+    if kind == 'horizons':
+        results = etl.evaluate_horizons(name, horizons, sigma, frequency)
+    elif kind == 'rules':
+        results = etl.evaluate_rules(rules, horizons, sigma, frequency)
+    else:
+        results = etl.rolling_backtest(horizons, [name], sigma).drop(columns='strategy')
+    results.insert(0, 'strategy', name)
+    results.insert(1, 'sigma', str(sigma))
+    if kind != 'backtest':
+        results.insert(2, 'frequency', str(frequency))
+    return kind, results
+
+def _jobs(args, rule_sets):
+    jobs = []
+    for sigma in args.sigma:
+        for frequency in args.frequency:
+            jobs += [('horizons', strategy, sigma, frequency, args.horizons, None) for strategy in args.strategies]
+            jobs += [('rules', name, sigma, frequency, args.horizons, rules) for name, rules in rule_sets.items()]
+        if args.backtest:
+            # One job per horizon: the backtest dominates the run time and its rows are independent
+            jobs += [('backtest', strategy, sigma, None, [horizon], None) for strategy in args.strategies for horizon in args.horizons]
+    return jobs
+
+def _sigma(value):
+    return value if value in ('full', 'expanding') else int(value)
+
+def _frequency(value):
+    return int(value) if value.isdigit() else value
+
+def run(args):
+    rule_sets = {}
+    for path in args.rules or []:
+        try:
+            rule_sets[Path(path).stem] = parse_rules(Path(path).read_text())
+        except RuleError as e:
+            raise SystemExit(f'{path}: {e}')
+
+    # Wait for the latest rows rather than report on stored history while they are fetched
+    master = set_master_data(load_universe())
+    universe = master.universe
+    jobs = _jobs(args, rule_sets)
+    if args.workers > 1 and len(jobs) > 1:
+        # spawn rather than fork, like the threshold sweep: the parent may hold fetch threads
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs)), mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(master.as_of, universe.dates, universe.tri, universe.names)) as executor:
+            results = list(executor.map(_run_job, jobs))
+    else:
+        results = [_run_job(job) for job in jobs]
+
+    tables = {}
+    for kind, frame in results:
+        tables.setdefault('backtest' if kind == 'backtest' else 'horizons', []).append(frame)
+    tables = {name: pd.concat(frames, ignore_index=True) for name, frames in tables.items()}
+    if 'backtest' in tables:
+        backtest = tables['backtest'].sort_values(['sigma', 'strategy', 'horizon', 'start_date'], kind='stable', ignore_index=True)
+        tables['backtest'] = backtest
+        benchmark = 'nifty_smallcap250' if 'nifty_smallcap250' in args.strategies else args.strategies[0]
+        tables['backtest_summary'] = pd.concat([ETLManager().backtest_summary(frame.drop(columns='sigma'), benchmark).assign(sigma=sigma)
+                                                for sigma, frame in backtest.groupby('sigma', sort=False)], ignore_index=True)
+    return master, tables
+
+def write(tables, output, formats):
+    os.makedirs(output, exist_ok=True)
+    written = []
+    for name, table in tables.items():
+        for file_format in formats:
+            path = os.path.join(output, f'{name}.{file_format}')
+            if file_format == 'csv':
+                table.to_csv(path, index=False)
+            else:
+                try:
+                    table.to_parquet(path, index=False)
+                except ImportError as e:
+                    raise SystemExit(f'Writing Parquet needs pyarrow or fastparquet: {e}')
+            written.append(path)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute the strategy reports without the Streamlit UI')
+    parser.add_argument('--output', default='reports', help='directory for the report files')
+    parser.add_argument('--format', nargs='+', choices=['csv', 'parquet'], default=['csv'])
+    parser.add_argument('--strategies', nargs='+', choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument('--horizons', nargs='+', type=int, default=HORIZONS, help='horizons in years')
+    parser.add_argument('--sigma', nargs='+', type=_sigma, default=['full'], help="'full', 'expanding' or a trailing window in periods of the SIP frequency")
+    parser.add_argument('--frequency', nargs='+', type=_frequency, default=['monthly'], help="'daily', 'weekly', 'monthly' or a day of the month")
+    parser.add_argument('--rules', nargs='+', help='Strategy Builder rule files, one strategy per file')
+    parser.add_argument('--no-backtest', dest='backtest', action='store_false', help='skip the rolling-start backtest')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    args = parser.parse_args()
+
+    master, tables = run(args)
+    written = write(tables, args.output, args.format)
+    with open(os.path.join(args.output, 'manifest.json'), 'w') as file:
+        json.dump({'as_of': master.as_of, 'data_version': master.version, 'last_date': str(master.universe.dates[-1]),
+                   'arguments': vars(args), 'files': written}, file, indent=2, default=str)
+    for path in written:
+        print(path)
+
+if __name__ == '__main__':
+    sys.exit(main())
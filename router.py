@@ -1,10 +1,25 @@
+import functools
 import streamlit as st
+from utils import metrics
+
+# Reruns only the decorated section of a page when a widget inside it changes
+# (st.experimental_fragment before streamlit 1.37)
+_fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+
+def fragment(function):
+    # A fragment rerun skips sidebar_menu(), so carry the session's metrics opt-in into it here
+    @functools.wraps(function)
+    def rerun(*args, **kwargs):
+        metrics.collect_here(st.session_state.get('metrics', False))
+        return function(*args, **kwargs)
+    return _fragment(rerun)
 
 PAGES = [
     'Introduction',
     'Strategy 1: Invest + Pause',
     'Strategy 2: Invest + Pause + Invest',
-    'Strategy Builder'
+    'Strategy Builder',
+    'Stress Test'
 ]
 
 def authenticated_sidebar():
@@ -27,6 +42,8 @@ def unauthenticated_menu():
     st.sidebar.page_link("pages/home.py", label=PAGES[0], icon="🏠")
     st.sidebar.page_link("pages/strategy1.py", label=PAGES[1], icon="♟️")
     st.sidebar.page_link("pages/strategy2.py", label=PAGES[2], icon="♟️")
+    st.sidebar.page_link("pages/strategy_builder.py", label=PAGES[3], icon="🛠️")
+    st.sidebar.page_link("pages/stress_test.py", label=PAGES[4], icon="🎲")
     
     footer="""
         <style>
@@ -48,8 +65,46 @@ def sidebar_menu():
     set_page_metadata()
     if "role" not in st.session_state or st.session_state.role is None:
         unauthenticated_menu()
+        metrics_panel()
         return
     authenticated_menu()
+    metrics_panel()
+
+def metrics_panel():
+    # Opt-in debug panel with stage timings and cache counters since the last reset. Opening the
+    # app with ?metrics=1 shows it to this session only and times this session's reruns (?metrics=0
+    # turns it off again); [METRICS] enabled in utils/conf.ini times every session in the process.
+    opt_in = st.query_params.get('metrics')
+    if opt_in is not None:
+        st.session_state.metrics = opt_in in ('1', 'true')
+    metrics.collect_here(st.session_state.get('metrics', False))
+    if not st.session_state.get('metrics', False):
+        return
+    import pandas as pd
+    snapshot = metrics.snapshot()
+    with st.sidebar.expander('⏱️ Performance', expanded=True):
+        if snapshot['spans']:
+            spans = pd.DataFrame.from_dict(snapshot['spans'], orient='index')
+            spans[['total_seconds', 'mean_seconds', 'max_seconds']] *= 1000
+            st.dataframe(spans, use_container_width=True, column_config={
+                'count': 'Runs',
+                'total_seconds': st.column_config.NumberColumn('Total ms', format='%.1f'),
+                'mean_seconds': st.column_config.NumberColumn('Mean ms', format='%.1f'),
+                'max_seconds': st.column_config.NumberColumn('Max ms', format='%.1f'),
+            })
+        else:
+            st.caption('No timings yet, rerun the page.')
+        if snapshot['caches']:
+            caches = pd.DataFrame.from_dict(snapshot['caches'], orient='index')
+            caches['hit_rate'] = caches['hit'] / (caches['hit'] + caches['miss']) * 100
+            st.dataframe(caches, use_container_width=True, column_config={
+                'hit': 'Hits', 'miss': 'Misses', 'hit_rate': st.column_config.NumberColumn('Hit rate', format='%.0f%%'),
+            })
+        left, middle, right = st.columns(3)
+        left.download_button('JSON', metrics.to_json(), file_name='metrics.json', mime='application/json')
+        middle.download_button('Prometheus', metrics.to_prometheus(), file_name='metrics.prom', mime='text/plain')
+        if right.button('Reset'):
+            metrics.reset()
 
 
 def redirect_unauthorized_users():
@@ -0,0 +1,11 @@
+import os
+import sys
+from streamlit.web import cli
+from utils import warmup
+
+# Start the app with the cache warm-up running from server boot rather than from the first
+# page view. Takes the same options as streamlit run:  python serve.py [--server.port 8501]
+if __name__ == '__main__':
+    warmup.start()
+    sys.argv = ['streamlit', 'run', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app.py'), *sys.argv[1:]]
+    sys.exit(cli.main())
@@ -1,8 +1,10 @@
 import streamlit as st
 
 from router import sidebar_menu
+from utils import warmup
 
 def run_UI():
+    warmup.start()
     sidebar_menu()
     st.switch_page("pages/home.py")
 
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from benchmarks.synthetic import synthetic_universe
+from utils.data_etl import ETLManager, set_master_data
+
+# The returns_from_* methods must give the numbers of the original per-row recurrence
+# present_value[i] = present_value[i-1]*tri_ratio[i] + cashflow[i], run here as it was
+# written, on a small synthetic universe.
+
+def _baseline_returns(df, sleeves, timeperiod):
+    # sleeves: (tri column, buy condition over df, starting value), as in the original methods
+    subset_df = df.copy(deep=True) if timeperiod is None else df.tail(timeperiod*12).copy()
+    peak_value = 0
+    cashflow = 0
+    for i, (column, condition, initial) in enumerate(sleeves):
+        subset_df[f'cashflow_{i}'] = np.where(condition[subset_df.index], 10000, 0)
+        subset_df[f'tri_ratio_{i}'] = subset_df[column] / subset_df[column].shift(1)
+        subset_df[f'present_value_{i}'] = float(initial)
+        cashflow = cashflow + subset_df[f'cashflow_{i}']
+    subset_df['cashflow'] = cashflow
+    subset_df = subset_df.reset_index(drop=True)
+    for i in range(1, len(subset_df)):
+        for j in range(len(sleeves)):
+            subset_df.loc[i, f'present_value_{j}'] = (subset_df.loc[i-1, f'present_value_{j}'] * subset_df.loc[i, f'tri_ratio_{j}']) + subset_df.loc[i, f'cashflow_{j}']
+    for j in range(len(sleeves)):
+        peak_value += subset_df[f'present_value_{j}'].max()
+    final_df = pd.concat([subset_df, pd.DataFrame({'date': subset_df['date'].max(), 'cashflow': -peak_value}, index=[len(subset_df)])])
+    return final_df[['date', 'cashflow']]
+
+@pytest.fixture(scope='module')
+def etl():
+    set_master_data(synthetic_universe(years=16))
+    return ETLManager()
+
+def _baseline_sleeves(df, strategy):
+    std_dev = df['relative_value'].std()
+    always = pd.Series(True, index=df.index)
+    return {
+        'nifty50': [('nifty50_tri', always, 10000)],
+        'nifty_smallcap250': [('nifty_smallcap250_tri', always, 10000)],
+        'strategy1': [('nifty_smallcap250_tri', df['relative_value'] < 1 + std_dev, 10000)],
+        'strategy2': [('nifty_smallcap250_tri', df['relative_value'] < 1 + std_dev, 10000),
+                      ('nifty50_tri', df['relative_value'] > 1 + 2*std_dev, 0)],
+    }[strategy]
+
+@pytest.mark.parametrize('strategy', ['nifty50', 'nifty_smallcap250', 'strategy1', 'strategy2'])
+@pytest.mark.parametrize('timeperiod', [None, 3, 5, 7, 10, 12, 15])
+def test_returns_match_the_per_row_recurrence(etl, strategy, timeperiod):
+    df = etl.prepare_master_data()
+    expected = _baseline_returns(df, _baseline_sleeves(df, strategy), timeperiod)
+    returns = getattr(etl, f'returns_from_{strategy}')(timeperiod)
+    np.testing.assert_array_equal(returns['date'].to_numpy(), expected['date'].to_numpy())
+    np.testing.assert_allclose(returns['cashflow'].to_numpy(), expected['cashflow'].to_numpy(dtype=np.float64), rtol=1e-12, atol=0)
+
+def test_strategies_pause_and_switch_on_the_synthetic_universe(etl):
+    # Guards the test above against a universe on which the σ rules never fire
+    df = etl.prepare_master_data()
+    sleeves = _baseline_sleeves(df, 'strategy2')
+    assert 0 < sleeves[0][1].sum() < len(df)
+    assert sleeves[1][1].sum() > 0
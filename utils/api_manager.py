@@ -1,17 +1,69 @@
 import configparser
 import os
-import streamlit as st
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from requests import HTTPError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import json
+import re
 import datetime
+from utils import metrics
+from utils.shared_cache import shared_cache
+
+_DATE_PATTERN = re.compile(r'"Date"\s*:\s*"(\d{1,2}) ([A-Za-z]{3}) (\d{4})"')
+_TRI_PATTERN = re.compile(r'"TotalReturnsIndex"\s*:\s*"?([-+0-9.eE]+)"?')
+_MONTHS = {'JAN': 1, 'FEB': 2, 'MAR': 3, 'APR': 4, 'MAY': 5, 'JUN': 6, 'JUL': 7, 'AUG': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DEC': 12}
+
+def _records(content):
+    # The "d" string of a niftyindices response; anything else (an error page served with a
+    # 200, a changed API) raises ValueError, like a response that fails to decode
+    payload = json.loads(content)
+    if not isinstance(payload, dict) or not isinstance(payload.get("d"), str):
+        raise ValueError('Unexpected niftyindices response, expected {"d": "<records>"}')
+    return payload["d"]
+
+def parse_total_returns(content):
+    # Decode a niftyindices {"d": "<json>"} response straight into typed arrays of
+    # datetime64[D] dates and float64 TRI values, skipping every other column.
+    records = _records(content)
+    dates = _DATE_PATTERN.findall(records)
+    tri = _TRI_PATTERN.findall(records)
+    if len(dates) != len(tri) or len(dates) != records.count('{'):
+        # Unexpected layout: fall back to a full decode of the records
+        try:
+            frame = pd.DataFrame.from_records(json.loads(records), columns=['Date', 'TotalReturnsIndex'])
+        except (TypeError, KeyError) as e:
+            raise ValueError(f'Unexpected niftyindices records: {e}') from e
+        return (pd.to_datetime(frame['Date'], format='%d %b %Y').to_numpy(dtype='datetime64[D]'),
+                pd.to_numeric(frame['TotalReturnsIndex']).to_numpy(dtype=np.float64))
+    if not dates:
+        return np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.float64)
+    parts = np.array(dates)
+    months, inverse = np.unique(parts[:, 1], return_inverse=True)
+    month = np.array([_MONTHS[name.upper()] for name in months])[inverse]
+    year = parts[:, 2].astype(np.int64)
+    day = parts[:, 0].astype(np.int64)
+    first_of_month = ((year - 1970) * 12 + month - 1).astype('datetime64[M]').astype('datetime64[D]')
+    return first_of_month + (day - 1), np.array(tri, dtype=np.float64)
+
+def total_returns_frame(dates, tri):
+    return pd.DataFrame({'Date': dates.astype('datetime64[ns]'), 'TotalReturnsIndex': tri})
 
 class NIFTYIndices:
-    def __init__(_self, API):
+    _session = None
+    _session_lock = threading.Lock()
+
+    def __init__(_self, API, url=None):
         config = configparser.ConfigParser()
         config.read(os.path.dirname(__file__) + '/conf.ini')
-        _self.url = config.get(API, 'url')
+        _self.url = url or config.get(API, 'url')
+        _self.timeout = config.getfloat(API, 'timeout', fallback=30)
+        _self.window_days = config.getint(API, 'window_days', fallback=730)
+        _self.max_workers = config.getint(API, 'max_workers', fallback=8)
         _self.header = {
             'Connection': 'keep-alive',
             'sec-ch-ua': '" Not;A Brand";v="99", "Google Chrome";v="91", "Chromium";v="91"',
@@ -29,20 +81,70 @@ class NIFTYIndices:
             'Accept-Language': 'en-US,en;q=0.9,hi;q=0.8',
         }
     
-    @st.cache_data
+    def _post(_self, symbol, start_date, end_date, index_name):
+        # Raw response body through the host-wide shared cache; only successful, well-formed responses are kept
+        data = {"cinfo": f"{{'name':'{symbol}','startDate':'{start_date}','endDate':'{end_date}','indexName':'{index_name}'}}"}
+
+        def fetch():
+            with metrics.span('api.request'):
+                request = _self.pooled_session().post(_self.url, headers=_self.header, json=data, timeout=_self.timeout)
+            request.raise_for_status()
+            _records(request.content)
+            return request.content
+        cache = shared_cache()
+        expires = cache.expiry(datetime.datetime.strptime(end_date, "%d-%b-%Y").date())
+        return cache.get_or_fetch([_self.url, symbol, start_date, end_date, index_name], fetch, expires)
+
     def _index_total_returns(_self, symbol, start_date, end_date, index_name):
         start_date = datetime.datetime.strptime(start_date, "%d-%b-%Y").strftime("%d-%b-%Y")
         end_date = datetime.datetime.strptime(end_date, "%d-%b-%Y").strftime("%d-%b-%Y")
-        data = {"cinfo": f"{{'name':'{symbol}','startDate':'{start_date}','endDate':'{end_date}','indexName':'{index_name}'}}"}
+        content = _self._post(symbol, start_date, end_date, index_name)
+        with metrics.span('api.parse'):
+            return total_returns_frame(*parse_total_returns(content))
 
-        request = requests.post(_self.url, headers=_self.header, json=data)
-        payload = request.json()
-        payload = json.loads(payload["d"])
-        if not payload:
-            request.raise_for_status()
-        
-        payload=pd.DataFrame.from_records(payload)
-        return payload
+    @classmethod
+    def pooled_session(cls):
+        # One keep-alive session per process, shared by every fetch thread
+        with cls._session_lock:
+            if cls._session is None:
+                retry = Retry(total=4, backoff_factor=0.5, backoff_max=8, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=None)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                cls._session = session
+        return cls._session
+
+    def _windows(_self, start_date, end_date):
+        start = datetime.datetime.strptime(start_date, "%d-%b-%Y")
+        end = datetime.datetime.strptime(end_date, "%d-%b-%Y")
+        windows = []
+        while start <= end:
+            window_end = min(start + datetime.timedelta(days=_self.window_days - 1), end)
+            windows.append((start.strftime("%d-%b-%Y"), window_end.strftime("%d-%b-%Y")))
+            start = window_end + datetime.timedelta(days=1)
+        return windows
+
+    @staticmethod
+    def _stitch(frames):
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame()
+        stitched = pd.concat(frames, ignore_index=True).drop_duplicates(subset='Date')
+        return stitched.sort_values('Date', kind='stable').reset_index(drop=True)
+
+    @metrics.timed('api.fetch_many')
+    def get_nse_indices_returns_many(_self, indices, end_date):
+        # Split every (symbol, start_date, index_name) request into date windows and fetch all
+        # windows of all indices concurrently over the pooled session. Returns {symbol: frame}.
+        jobs = [(symbol, window, index_name) for symbol, start_date, index_name in indices for window in _self._windows(start_date, end_date)]
+        results = {symbol: [] for symbol, _, _ in indices}
+        if jobs:
+            with ThreadPoolExecutor(max_workers=min(_self.max_workers, len(jobs))) as executor:
+                frames = list(executor.map(lambda job: _self._index_total_returns(job[0], *job[1], job[2]), jobs))
+            for (symbol, _, _), frame in zip(jobs, frames):
+                results[symbol].append(frame)
+        return {symbol: _self._stitch(symbol_frames) for symbol, symbol_frames in results.items()}
 
     def get_nse_indices_returns(_self, symbol, start_date, end_date, index_name):
         try:
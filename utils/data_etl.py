@@ -1,106 +1,385 @@
+from collections import OrderedDict, namedtuple
 from datetime import datetime
+import hashlib
+import threading
 import pandas as pd
 import numpy as np
-from utils.api_manager import NIFTYIndices
+from utils import metrics
+from utils.shared_cache import shared_cache
+from utils.sigma_bands import expanding_bands, rolling_bands
+from utils.sip_engine import SIP_AMOUNT, accumulate, accumulate_windows, buy_mask, growth_prefix, rolling_windows, tri_ratios, window_cashflows, window_values
+from utils.strategy_rules import TARGETS, compile_mask, parse_rules
+from utils.tri_store import on_append
+from utils.monte_carlo import simulate, summarize
+from utils.sweep import threshold_sweep
+from utils.universe import IndexUniverse
+from utils.xirr import xirr_batch
+
+STRATEGIES = ['nifty50', 'nifty_smallcap250', 'strategy1', 'strategy2']
+# Horizons (in years) the strategy pages compare
+HORIZONS = [3, 5, 7, 10, 12, 15]
+# SIP frequencies; an integer 1-31 invests on the first trading day on or after that day of the
+# month, or on the month's last trading day when none is left
+FREQUENCIES = ['daily', 'weekly', 'monthly']
+# SIP periods in a year at each frequency (about 250 NSE trading days), to express trailing σ windows in years
+PERIODS_PER_YEAR = {'daily': 250, 'weekly': 52, 'monthly': 12}
+
+# Sleeves of each strategy as (tri column, buy rule, starting value): the rule is None to
+# always buy, or (comparison, k) to buy while relative_value is below or above 1 + kσ
+SLEEVES = {
+    'nifty50': [('nifty50_tri', None, SIP_AMOUNT)],
+    'nifty_smallcap250': [('nifty_smallcap250_tri', None, SIP_AMOUNT)],
+    'strategy1': [('nifty_smallcap250_tri', ('<', 1), SIP_AMOUNT)],
+    'strategy2': [('nifty_smallcap250_tri', ('<', 1), SIP_AMOUNT), ('nifty50_tri', ('>', 2), 0)],
+}
+
+def default_thresholds(strategy):
+    # The σ multipliers k of a strategy's buy rules, in SLEEVES order
+    return tuple(rule[1] for _, rule, _ in SLEEVES[strategy] if rule is not None)
+
+# Process-wide master data shared by every page and session. It is rebuilt only when
+# the as-of date rolls over or invalidate_master_data() is called, which happens whenever
+# rows are appended to the TRI store.
+MasterData = namedtuple('MasterData', ['as_of', 'version', 'frame', 'universe'])
+# Reentrant: a store append while the master data is being built invalidates it from the same thread
+_master_lock = threading.RLock()
+_master = None
+
+def _build_master_data(universe, frequency='monthly'):
+    # The universe is joined on date, so a holiday row present in only one feed is dropped
+    # instead of shifting the other series by a row
+    sampled = universe.sample(frequency)
+    columns = {
+        'date': sampled.dates.astype('datetime64[ns]'),
+        'nifty50_tri': sampled.column('nifty50'),
+        'nifty_smallcap250_tri': sampled.column('nifty_smallcap250'),
+        'largecap_rel_change': sampled.rel_change('nifty50'),
+        'smallcap_rel_change': sampled.rel_change('nifty_smallcap250'),
+        'relative_value': sampled.relative_value('nifty_smallcap250', 'nifty50'),
+    }
+    # The frame is shared by every page and session: its columns are read-only arrays, so
+    # callers can add or replace columns on a shallow copy but never write into the cache
+    for values in columns.values():
+        values.flags.writeable = False
+    df_sampled = pd.DataFrame(columns, copy=False)
+    return df_sampled
+
+def _fingerprint(universe):
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(' '.join(universe.names).encode())
+    digest.update(universe.dates.tobytes())
+    digest.update(np.ascontiguousarray(universe.tri).tobytes())
+    return digest.hexdigest()
+
+def load_universe(as_of=None, background=False):
+    # The indices behind the master data; background=True never waits on niftyindices once
+    # history is stored, which is what the pages want, while report runs wait for fresh rows
+    as_of = as_of or datetime.today().strftime('%d-%b-%Y')
+    return IndexUniverse.load(['nifty50', 'nifty_smallcap250'], "01-Apr-2005", as_of, background=background)
+
+def _master_data():
+    global _master
+    as_of = datetime.today().strftime('%d-%b-%Y')
+    master = _master
+    if master is not None and master.as_of == as_of:
+        metrics.hit('master_data')
+        return master
+    with _master_lock:
+        if _master is None or _master.as_of != as_of:
+            metrics.miss('master_data')
+            with metrics.span('etl.load_universe'):
+                universe = load_universe(as_of, background=True)
+            with metrics.span('etl.build_master_data'):
+                frame = _build_master_data(universe)
+                _master = MasterData(as_of, _fingerprint(universe), frame, universe)
+        else:
+            metrics.hit('master_data')
+        return _master
+
+def set_master_data(universe, as_of=None):
+    # Serve an already loaded universe as the master data until the as-of date rolls over,
+    # for offline runs and benchmarks
+    global _master
+    as_of = as_of or datetime.today().strftime('%d-%b-%Y')
+    with _master_lock:
+        _master = MasterData(as_of, _fingerprint(universe), _build_master_data(universe), universe)
+        return _master
+
+def data_version():
+    return _master_data().version
+
+def _master_frame(frequency='monthly'):
+    # The monthly frame is built with the master data; other frequencies are sampled from the
+    # daily universe through its precomputed bucket indexes and cached per data version
+    master = _master_data()
+    if frequency == 'monthly':
+        return master.frame
+    return _cached(('master_frame', master.version, frequency), lambda: _build_master_data(master.universe, frequency))
+
+_results_lock = threading.Lock()
+_results = OrderedDict()
+
+def _cached(key, build, maxsize=64):
+    # Small process-wide LRU for derived results; keys carry the data version, so entries
+    # built from superseded data are never served and simply age out
+    with _results_lock:
+        if key in _results:
+            _results.move_to_end(key)
+            metrics.hit(key[0])
+            return _results[key]
+    metrics.miss(key[0])
+    value = build()
+    with _results_lock:
+        _results[key] = value
+        while len(_results) > maxsize:
+            _results.popitem(last=False)
+    return value
+
+def invalidate_master_data(refetch=True):
+    # Call when new index data is available; the next reader rebuilds the master data, and
+    # with refetch also asks niftyindices again for the dates not yet fully published
+    global _master
+    with _master_lock:
+        if refetch:
+            shared_cache().clear(volatile_only=True)
+        _master = None
+
+# Rows appended to the TRI store, by this process or a background refresh, are new data
+on_append(lambda index_name, rows: invalidate_master_data(refetch=False))
 
 class ETLManager:
-    def __init__(self):
-        self._nifty50_df = NIFTYIndices('NIFTYINDEXTRI').get_nse_indices_returns("NIFTY 50","01-Apr-2005", datetime.today().strftime('%d-%b-%Y'), "NIFTY 50")
-        self._smallcap250_df = NIFTYIndices('NIFTYINDEXTRI').get_nse_indices_returns("NIFTY SMALLCAP 250","01-Apr-2005", datetime.today().strftime('%d-%b-%Y'), "NIFTY SMALLCAP 250")
-
-    def prepare_master_data(self):
-        combined_df = self._nifty50_df.copy(deep=True)
-        combined_df['small_tri'] = self._smallcap250_df['TotalReturnsIndex']
-        combined_df = combined_df[['Date','TotalReturnsIndex', 'small_tri']]
-        col_names = combined_df.columns
-        new_cols = ['date', 'nifty50_tri', 'nifty_smallcap250_tri']
-        combined_df.rename(columns=dict(zip(col_names, new_cols)), inplace=True)
-        combined_df['date'] = pd.to_datetime(combined_df['date'], format='%d %b %Y')
-        combined_df['nifty50_tri'] = pd.to_numeric(combined_df['nifty50_tri'])
-        combined_df['nifty_smallcap250_tri'] = pd.to_numeric(combined_df['nifty_smallcap250_tri'])
-        df_monthly = combined_df.groupby([combined_df['date'].dt.year, combined_df['date'].dt.month], as_index=False).first()
-        df_monthly['largecap_rel_change'] = df_monthly['nifty50_tri']/df_monthly['nifty50_tri'].iloc[0]
-        df_monthly['smallcap_rel_change'] = df_monthly['nifty_smallcap250_tri']/df_monthly['nifty_smallcap250_tri'].iloc[0]
-        df_monthly['relative_value'] = df_monthly['smallcap_rel_change']/df_monthly['largecap_rel_change']
-        return df_monthly
+    @metrics.timed('etl.prepare_master_data')
+    def prepare_master_data(self, frequency='monthly'):
+        return _master_frame(frequency).copy(deep=False)
     
-    def returns_from_nifty50(self, timeperiod = None):
-        df = self.prepare_master_data()
+    def _std_dev(self, df, sigma='full'):
+        # sigma='full' uses one standard deviation over the whole history, which includes months
+        # after each decision. 'expanding' and an integer window (trailing rows, i.e. months at
+        # the monthly frequency) give every row a value computed only from the rows up to it.
+        if sigma == 'full':
+            return df['relative_value'].std()
+        if sigma == 'expanding':
+            return expanding_bands(df['relative_value'].to_numpy())[1]
+        return rolling_bands(df['relative_value'].to_numpy(), [int(sigma)])[1][0]
+
+    def _sleeves(self, strategy, df, sigma='full'):
+        # Each sleeve is (tri column, buy condition, starting value) over the whole of df and
+        # is grown independently; a strategy's value is the sum of its sleeves
+        if strategy not in SLEEVES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+        relative_value = df['relative_value'].to_numpy()
+        std_dev = self._std_dev(df, sigma)
+        return [(column, buy_mask(rule, relative_value, std_dev), initial) for column, rule, initial in SLEEVES[strategy]]
+
+    def _sleeve_arrays(self, strategy, df, sigma='full'):
+        sleeves = self._sleeves(strategy, df, sigma)
+        tri = np.vstack([df[column].to_numpy(dtype=np.float64) for column, _, _ in sleeves])
+        cashflow = np.vstack([np.where(condition, SIP_AMOUNT, 0) for _, condition, _ in sleeves])
+        initial = np.array([value for _, _, value in sleeves], dtype=np.float64)
+        return tri, cashflow, initial
+
+    def _start(self, df, timeperiod, frequency='monthly'):
+        # Index of the first row of df.tail(timeperiod*12) for monthly SIPs, otherwise of the
+        # first row after the same date timeperiod years before the last row
         if timeperiod == None:
-            subset_df = df.copy(deep=True)
-        else:
-            subset_df = df.tail(timeperiod*12)
-        subset_df['condition'] = 'buy'
-        subset_df['cashflow'] = np.where(subset_df['condition']=='buy', 10000, 0)
-        subset_df['previous_nifty50_tri'] = subset_df['nifty50_tri'].shift(1)
-        subset_df['tri_ratio'] = (subset_df['nifty50_tri'] / subset_df['previous_nifty50_tri'])
-        subset_df['present_value'] = 10000
-        subset_df = subset_df.reset_index(drop=True)
-        for i in range(1, len(subset_df)):
-            subset_df.loc[i, 'present_value'] = (subset_df.loc[i-1, 'present_value'] * subset_df.loc[i, 'tri_ratio']) + subset_df.loc[i, 'cashflow']
-        final_df = pd.concat([subset_df, pd.DataFrame({'date': subset_df['date'].max(), 'cashflow': -(subset_df['present_value'].max())}, index=[len(subset_df)])])
-        final_df = final_df[['date', 'cashflow']]
-        return final_df
+            return 0
+        if frequency == 'monthly':
+            return max(len(df) - timeperiod*12, 0)
+        dates = df['date'].to_numpy()
+        return int(np.searchsorted(dates, (pd.Timestamp(dates[-1]) - pd.DateOffset(years=timeperiod)).to_datetime64(), side='right'))
+
+    def _returns(self, strategy, timeperiod, sigma, frequency='monthly'):
+        with metrics.span(f'etl.returns_from_{strategy}'):
+            df = self.prepare_master_data(frequency)
+            tri, cashflow, initial = self._sleeve_arrays(strategy, df, sigma)
+            start = self._start(df, timeperiod, frequency)
+            tri, cashflow = tri[:, start:], cashflow[:, start:]
+            present_value = accumulate(tri_ratios(tri), cashflow, initial)
+            dates = df['date'].to_numpy()[start:]
+            final_df = pd.DataFrame({
+                'date': np.append(dates, dates.max()),
+                'cashflow': np.append(cashflow.sum(axis=0), -(present_value.max(axis=1).sum()))
+            })
+            return final_df
+
+    def returns_from_nifty50(self, timeperiod = None, frequency = 'monthly'):
+        return self._returns('nifty50', timeperiod, 'full', frequency)
     
-    def returns_from_nifty_smallcap250(self, timeperiod = None):
-        df = self.prepare_master_data()
-        if timeperiod == None:
-            subset_df = df.copy(deep=True)
-        else:
-            subset_df = df.tail(timeperiod*12)
-        subset_df['condition'] = 'buy'
-        subset_df['cashflow'] = np.where(subset_df['condition']=='buy', 10000, 0)
-        subset_df['previous_smallcap250_tri'] = subset_df['nifty_smallcap250_tri'].shift(1)
-        subset_df['tri_ratio'] = (subset_df['nifty_smallcap250_tri'] / subset_df['previous_smallcap250_tri'])
-        subset_df['present_value'] = 10000
-        subset_df = subset_df.reset_index(drop=True)
-        for i in range(1, len(subset_df)):
-            subset_df.loc[i, 'present_value'] = (subset_df.loc[i-1, 'present_value'] * subset_df.loc[i, 'tri_ratio']) + subset_df.loc[i, 'cashflow']
-        final_df = pd.concat([subset_df, pd.DataFrame({'date': subset_df['date'].max(), 'cashflow': -(subset_df['present_value'].max())}, index=[len(subset_df)])])
-        final_df = final_df[['date', 'cashflow']]
-        return final_df
+    def returns_from_nifty_smallcap250(self, timeperiod = None, frequency = 'monthly'):
+        return self._returns('nifty_smallcap250', timeperiod, 'full', frequency)
     
-    def returns_from_strategy1(self, timeperiod = None):
-        df = self.prepare_master_data()
-        std_dev = df['relative_value'].std()
-        if timeperiod == None:
-            subset_df = df.copy(deep=True)
-        else:
-            subset_df = df.tail(timeperiod*12)
-        subset_df['condition'] = np.where(subset_df['relative_value']<(1+std_dev), 'buy', 'pause')
-        subset_df['cashflow'] = np.where(subset_df['condition']=='buy', 10000, 0)
-        subset_df['previous_smallcap250_tri'] = subset_df['nifty_smallcap250_tri'].shift(1)
-        subset_df['tri_ratio'] = (subset_df['nifty_smallcap250_tri'] / subset_df['previous_smallcap250_tri'])
-        subset_df['present_value'] = 10000
-        subset_df = subset_df.reset_index(drop=True)
-        for i in range(1, len(subset_df)):
-            subset_df.loc[i, 'present_value'] = (subset_df.loc[i-1, 'present_value'] * subset_df.loc[i, 'tri_ratio']) + subset_df.loc[i, 'cashflow']
-        final_df = pd.concat([subset_df, pd.DataFrame({'date': subset_df['date'].max(), 'cashflow': -(subset_df['present_value'].max())}, index=[len(subset_df)])])
-        final_df = final_df[['date', 'cashflow']]
-        return final_df
+    def returns_from_strategy1(self, timeperiod = None, sigma = 'full', frequency = 'monthly'):
+        return self._returns('strategy1', timeperiod, sigma, frequency)
     
-    def returns_from_strategy2(self, timeperiod = None):
-        df = self.prepare_master_data()
-        std_dev = df['relative_value'].std()
-        if timeperiod == None:
-            subset_df = df.copy(deep=True)
-        else:
-            subset_df = df.tail(timeperiod*12)
-        subset_df['condition_s'] = np.where(subset_df['relative_value']<(1+std_dev), 'buy', 'pause')
-        subset_df['condition_l'] = np.where(subset_df['relative_value']>(1+2*std_dev), 'buy', 'pause')
-        subset_df['cashflow_s'] = np.where(subset_df['condition_s']=='buy', 10000, 0)
-        subset_df['cashflow_l'] = np.where(subset_df['condition_l']=='buy', 10000, 0)
-        subset_df['cashflow'] = subset_df['cashflow_s'] + subset_df['cashflow_l']
-        subset_df['previous_smallcap250_tri'] = subset_df['nifty_smallcap250_tri'].shift(1)
-        subset_df['previous_nifty50_tri'] = subset_df['nifty50_tri'].shift(1)
-        subset_df['tri_ratio_s'] = (subset_df['nifty_smallcap250_tri'] / subset_df['previous_smallcap250_tri'])
-        subset_df['tri_ratio_l'] = (subset_df['nifty50_tri'] / subset_df['previous_nifty50_tri'])
-        subset_df['present_value_s'] = 10000
-        subset_df['present_value_l'] = 0
-        subset_df = subset_df.reset_index(drop=True)
-        for i in range(1, len(subset_df)):
-            subset_df.loc[i, 'present_value_s'] = (subset_df.loc[i-1, 'present_value_s'] * subset_df.loc[i, 'tri_ratio_s']) + subset_df.loc[i, 'cashflow_s']
-            subset_df.loc[i, 'present_value_l'] = (subset_df.loc[i-1, 'present_value_l'] * subset_df.loc[i, 'tri_ratio_l']) + subset_df.loc[i, 'cashflow_l']
-        final_df = pd.concat([subset_df, pd.DataFrame({'date': subset_df['date'].max(), 'cashflow': -(subset_df['present_value_s'].max()+subset_df['present_value_l'].max())}, index=[len(subset_df)])])
-        final_df = final_df[['date', 'cashflow']]
-        return final_df
\ No newline at end of file
+    def returns_from_strategy2(self, timeperiod = None, sigma = 'full', frequency = 'monthly'):
+        return self._returns('strategy2', timeperiod, sigma, frequency)
+
+    @metrics.timed('etl.evaluate_horizons')
+    def evaluate_horizons(self, strategy, horizons, sigma='full', frequency='monthly'):
+        # Invested amount, final value and XIRR of a strategy for every horizon (in years). The
+        # horizons are nested suffixes of the same SIP series and are solved together in one
+        # pass; cached per data version.
+        if strategy not in SLEEVES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+        master = _master_data()
+        key = ('horizons', master.version, strategy, tuple(horizons), sigma, frequency)
+        results = _cached(key, lambda: self._horizons(strategy, horizons, default_thresholds(strategy), sigma, frequency, SIP_AMOUNT))
+        return results.copy()
+
+    @metrics.timed('etl.what_if')
+    def what_if(self, strategy, horizons, amount=SIP_AMOUNT, thresholds=None, sigma='full', frequency='monthly'):
+        # evaluate_horizons with another SIP amount and, optionally, other σ multipliers k for
+        # the strategy's buy rules, one per rule in SLEEVES order. The results are linear in the
+        # amount and the XIRR does not depend on it, so each threshold and horizon set is solved
+        # once for a unit amount and only rescaled when the amount changes.
+        if strategy not in SLEEVES:
+            raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+        defaults = default_thresholds(strategy)
+        thresholds = defaults if thresholds is None else tuple(float(k) for k in thresholds)
+        if len(thresholds) != len(defaults):
+            raise ValueError(f"'{strategy}' has {len(defaults)} buy rules, got {len(thresholds)} thresholds")
+        if thresholds == defaults and amount == SIP_AMOUNT:
+            return self.evaluate_horizons(strategy, horizons, sigma, frequency)
+        master = _master_data()
+        key = ('what_if', master.version, strategy, tuple(horizons), thresholds, sigma, frequency)
+        unit = _cached(key, lambda: self._horizons(strategy, horizons, thresholds, sigma, frequency, 1.0))
+        return unit.assign(invested=unit['invested']*amount, final_value=unit['final_value']*amount)
+
+    def _tri_growth(self, frequency):
+        # Prefix products of the TRI ratios per column, shared by every threshold, rule, horizon and amount
+        master = _master_data()
+        df = _master_frame(frequency)
+        return _cached(('tri_growth', master.version, frequency),
+                       lambda: {column: growth_prefix(tri_ratios(df[column].to_numpy(dtype=np.float64))) for column in TARGETS.values()})
+
+    def _horizons(self, strategy, horizons, thresholds, sigma, frequency, amount):
+        df = _master_frame(frequency)
+        growth = self._tri_growth(frequency)
+        relative_value = df['relative_value'].to_numpy()
+        std_dev = self._std_dev(df, sigma)
+        multipliers = iter(thresholds)
+        sleeves = [(column, rule if rule is None else (rule[0], next(multipliers)), initial) for column, rule, initial in SLEEVES[strategy]]
+        cashflow = np.vstack([np.where(buy_mask(rule, relative_value, std_dev), amount, 0.0) for _, rule, _ in sleeves])
+        initial = np.array([value / SIP_AMOUNT * amount for _, _, value in sleeves])
+        starts = np.array([self._start(df, horizon, frequency) for horizon in horizons], dtype=np.int64)
+        present_value = accumulate_windows(None, cashflow, initial, starts, growth=np.vstack([growth[column] for column, _, _ in sleeves]))
+        return self._horizon_results(df, horizons, starts, cashflow.sum(axis=0), np.nanmax(present_value, axis=-1).sum(axis=0))
+
+    def _horizon_results(self, df, horizons, starts, total_cashflow, final_value):
+        invested = np.cumsum(total_cashflow[::-1])[::-1][starts]
+        # One cashflow row per horizon on the shared date grid, closed by the final value
+        window_cashflow = np.where(np.arange(len(df)) >= starts[:, None], total_cashflow, 0.0)
+        window_cashflow[:, -1] -= final_value
+        returns = xirr_batch(df['date'].to_numpy(), window_cashflow)
+        return pd.DataFrame({'horizon': horizons, 'invested': invested, 'final_value': final_value, 'xirr': returns})
+
+    @metrics.timed('etl.evaluate_rules')
+    def evaluate_rules(self, rules, horizons, sigma='full', frequency='monthly'):
+        # evaluate_horizons for a Strategy Builder rule set (see utils.strategy_rules). Every rule
+        # is a sleeve accumulated like the SLEEVES of the built-in strategies: the first rule
+        # opens each window with one instalment of its amount and the others open empty, so
+        # Strategy 2 written as rules gives Strategy 2's results. Each sleeve is cached by rule
+        # hash and position, so editing one rule only recomputes that rule.
+        if isinstance(rules, str):
+            rules = parse_rules(rules)
+        master = _master_data()
+        df = _master_frame(frequency)
+        starts = np.array([self._start(df, horizon, frequency) for horizon in horizons], dtype=np.int64)
+        std_dev = self._std_dev(df, sigma)
+        growth = self._tri_growth(frequency)
+        sleeves = []
+        for i, rule in enumerate(rules):
+            initial = rule.amount if i == 0 else 0.0
+            key = ('rule_sleeve', master.version, rule.key, initial, tuple(horizons), sigma, frequency)
+            sleeves.append(_cached(key, lambda rule=rule, initial=initial: self._rule_sleeve(df, rule, initial, starts, std_dev, growth)))
+        total_cashflow = np.sum([cashflow for cashflow, _ in sleeves], axis=0)
+        final_value = np.sum([peak_value for _, peak_value in sleeves], axis=0)
+        return self._horizon_results(df, horizons, starts, total_cashflow, final_value)
+
+    def _rule_sleeve(self, df, rule, initial, starts, std_dev, growth):
+        buy = compile_mask(rule, df['relative_value'].to_numpy(), std_dev)
+        cashflow = np.where(buy, rule.amount, 0.0)
+        present_value = accumulate_windows(None, cashflow, initial, starts, growth=growth[TARGETS[rule.target]])
+        return cashflow, np.nanmax(present_value, axis=-1)
+
+    @metrics.timed('etl.rolling_backtest')
+    def rolling_backtest(self, horizons, strategies=STRATEGIES, sigma='full'):
+        # Every strategy over every start month and horizon (in years) for which a full window
+        # of history exists. One row per (strategy, horizon, start) with invested amount,
+        # final value and XIRR; cached per data version.
+        master = _master_data()
+        key = ('rolling_backtest', master.version, tuple(horizons), tuple(strategies), sigma)
+        return _cached(key, lambda: self._rolling_backtest(master.frame, horizons, strategies, sigma))
+
+    def _rolling_backtest(self, df, horizons, strategies, sigma):
+        dates = df['date'].to_numpy()
+        window_start, window_end = rolling_windows(len(df), [horizon*12 for horizon in horizons])
+        frames, cashflows = [], []
+        for strategy in strategies:
+            tri, cashflow, initial = self._sleeve_arrays(strategy, df, sigma)
+            final_value = window_values(tri_ratios(tri), cashflow, initial, window_start, window_end)
+            window_cashflow = window_cashflows(cashflow.sum(axis=0), window_start, window_end, final_value)
+            frames.append(pd.DataFrame({
+                'strategy': strategy,
+                'horizon': (window_end - window_start + 1) // 12,
+                'start_date': dates[window_start],
+                'invested': window_cashflow.sum(axis=1) + final_value,
+                'final_value': final_value,
+            }))
+            cashflows.append(window_cashflow)
+        backtest = pd.concat(frames, ignore_index=True)
+        backtest['xirr'] = xirr_batch(dates, np.vstack(cashflows))
+        return backtest
+
+    @metrics.timed('etl.threshold_sweep')
+    def threshold_sweep(self, pause_multipliers, switch_multipliers, horizons, max_workers=None, sigma='full', cache_path=None):
+        # Strategy 2 with the 1σ pause and 2σ switch thresholds replaced by every k1, k2 in the
+        # grid, over every start month of every horizon; see utils.sweep.threshold_sweep
+        master = _master_data()
+        df = master.frame
+        arrays = {
+            'dates': df['date'].to_numpy(dtype='datetime64[D]'),
+            'relative_value': df['relative_value'].to_numpy(),
+            'std_dev': self._std_dev(df, sigma),
+            'nifty50_tri': df['nifty50_tri'].to_numpy(),
+            'nifty_smallcap250_tri': df['nifty_smallcap250_tri'].to_numpy(),
+        }
+        return threshold_sweep(arrays, master.version, pause_multipliers, switch_multipliers, horizons, max_workers, cache_path)
+
+    @metrics.timed('etl.monte_carlo')
+    def monte_carlo(self, strategies=STRATEGIES, paths=10000, years=10, block_months=12, seed=0, max_workers=None):
+        # Every strategy over the same block-bootstrapped monthly paths starting from the latest
+        # month, with the buy rules at the full-history σ; see utils.monte_carlo. Cached per data
+        # version and parameters.
+        master = _master_data()
+        key = ('monte_carlo', master.version, tuple(strategies), paths, years, block_months, seed)
+        return _cached(key, lambda: self._monte_carlo(master.frame, strategies, paths, years, block_months, seed, max_workers))
+
+    def _monte_carlo(self, df, strategies, paths, years, block_months, seed, max_workers):
+        columns = ['nifty50_tri', 'nifty_smallcap250_tri']
+        arrays = {
+            'columns': columns,
+            'growth': tri_ratios(df[columns].to_numpy(dtype=np.float64).T)[:, 1:].T,
+            'relative_value': df['relative_value'].iloc[-1],
+            'date': df['date'].iloc[-1].to_datetime64(),
+            'std_dev': self._std_dev(df),
+        }
+        return simulate(arrays, {strategy: SLEEVES[strategy] for strategy in strategies}, paths, years, block_months, seed, max_workers)
+
+    def monte_carlo_summary(self, simulation, benchmark='nifty_smallcap250'):
+        return pd.DataFrame(summarize(simulation, benchmark))
+
+    def backtest_summary(self, backtest, benchmark='nifty_smallcap250'):
+        # XIRR percentiles per strategy and horizon, and the share of start months in which
+        # the strategy beat the benchmark over the same window
+        benchmark_xirr = backtest[backtest['strategy'] == benchmark].set_index(['horizon', 'start_date'])['xirr']
+        compared = backtest.join(benchmark_xirr.rename('benchmark_xirr'), on=['horizon', 'start_date'])
+        compared['win'] = compared['xirr'] > compared['benchmark_xirr']
+        grouped = compared.groupby(['strategy', 'horizon'], sort=False)
+        summary = grouped['xirr'].quantile([0.1, 0.25, 0.5, 0.75, 0.9]).unstack()
+        summary.columns = ['p10', 'p25', 'median', 'p75', 'p90']
+        summary.insert(0, 'starts', grouped.size())
+        summary['win_rate'] = grouped['win'].mean()
+        summary = summary.reset_index()
+        summary.loc[summary['strategy'] == benchmark, 'win_rate'] = np.nan
+        return summary
@@ -0,0 +1,171 @@
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import streamlit as st
+from utils import metrics
+from utils.sip_engine import SIP_AMOUNT
+from utils.sweep import summarize
+
+# Page figures built once per data version and figure spec and shared by every session. A
+# rerun looks the figure up and hands it to st.plotly_chart, skipping the data work behind it
+# and the Plotly object construction; the cached figures must not be modified. Plotly, and
+# pandas through utils.data_etl, are only imported once a figure is needed.
+
+_figures_lock = threading.Lock()
+_figures = OrderedDict()
+
+# What the pages open with, shared with the warm-up so that it builds the very same figures
+STRATEGY_NAMES = {'nifty50': 'Nifty 50', 'nifty_smallcap250': 'Nifty Smallcap 250', 'strategy1': 'Strategy 1', 'strategy2': 'Strategy 2'}
+RELATIVE_VALUE_CHARTS = {
+    'ratio': {'yaxis_title': ' Ratio of the indices'},
+    'bands': {'yaxis_title': ' Variation of the indices',
+              'ticks': [(-3, '- 3σ'), (-2, '- 2σ'), (-1, '- 1σ'), (0, '1'), (1, '+ 1σ'), (2, '+ 2σ'), (3, '+ 3σ')],
+              'zones': [(-1, 1, 'blue', 0.15, None), (-2, 2, 'blue', 0.1, None), (-3, 3, 'blue', 0.05, None)]},
+    'strategy1': {'yaxis_title': ' Variation of the indices',
+                  'ticks': [('min', '...'), (0, '1'), (1, '+ 1σ'), ('max', '...')],
+                  'zones': [('min', 1, 'seagreen', 0.2, 'INVEST'), (1, 'max', 'maroon', 0.1, 'PAUSE')]},
+    'strategy2': {'yaxis_title': ' Variation of the indices',
+                  'ticks': [('min', '...'), (0, '1'), (1, '+ 1σ'), (2, '+ 2σ'), ('max', '...')],
+                  'zones': [('min', 1, 'seagreen', 0.2, 'INVEST IN SMALLCAP'), (1, 2, 'maroon', 0.1, 'PAUSE SMALLCAP INVESTMENTS'),
+                            (2, 'max', 'seagreen', 0.2, 'INVEST IN LARGECAP')]},
+}
+
+def strategy_series(strategy):
+    # The two indices and one strategy as (strategy, name, colour), as the strategy pages compare them
+    return [('nifty50', 'Nifty 50', 'grey'), ('nifty_smallcap250', 'Nifty Smallcap 250', 'lightslategray'),
+            (strategy, STRATEGY_NAMES[strategy], 'palevioletred')]
+
+def cached_figure(name, spec, build, maxsize=128):
+    from utils.data_etl import data_version
+    key = (name, data_version(), json.dumps(spec, sort_keys=True, default=str))
+    with _figures_lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            metrics.hit('figure')
+            return _figures[key]
+    metrics.miss('figure')
+    with metrics.span('figure.build'):
+        value = build()
+    with _figures_lock:
+        _figures[key] = value
+        while len(_figures) > maxsize:
+            _figures.popitem(last=False)
+    return value
+
+def plotly_chart(figure, use_container_width=True):
+    # A Figure rather than its dict: st.plotly_chart re-validates dicts, which costs more than the lookup saved
+    with metrics.span('figure.render'):
+        return st.plotly_chart(figure, use_container_width=use_container_width)
+
+def _horizon_axis(figure, years):
+    figure.update_layout(xaxis=dict(
+        tickmode='array',
+        ticktext=[f'{year} years' for year in years],
+        tickvals=years)
+    )
+    figure.update_layout(legend = {"orientation": "h", "xanchor": "center", "x": 0.5})
+
+def relative_value_chart(yaxis_title, ticks=(), zones=()):
+    # Line chart of relative_value. Bounds are 'min', 'max' or k for the 1 + kσ band;
+    # ticks are (bound, text) and zones (lower, upper, colour, opacity, label or None).
+    spec = {'yaxis_title': yaxis_title, 'ticks': ticks, 'zones': zones}
+
+    def build():
+        import plotly.express as px
+        from utils.data_etl import ETLManager
+        df = ETLManager().prepare_master_data()
+        std_dev = df['relative_value'].std()
+        bounds = {'min': df['relative_value'].min(), 'max': df['relative_value'].max()}
+        value = lambda bound: bounds[bound] if bound in bounds else 1 + bound*std_dev
+        fig = px.line(df, x='date', y='relative_value', color_discrete_sequence=["purple"])
+        fig.update_layout(xaxis_title='', yaxis_title=yaxis_title)
+        if ticks:
+            fig.update_layout(yaxis=dict(
+                tickmode='array',
+                ticktext=[text for _, text in ticks],
+                tickvals=[value(bound) for bound, _ in ticks]
+            ))
+        fig.update_traces(mode="lines", hovertemplate = "Date: %{x} <br>Ratio: %{y:.2f}", xhoverformat="%b %d, %Y")
+        fig.update_layout(hovermode="x unified")
+        for lower, upper, color, opacity, label in zones:
+            shape = dict(type="rect", x0=df['date'].min(), x1=df['date'].max(), y0=value(lower), y1=value(upper), fillcolor=color, opacity=opacity, line_width=1)
+            if label:
+                shape['label'] = dict(text=label, textposition="middle center", font=dict(size=20))
+            fig.add_shape(**shape)
+        fig.update_xaxes(dtick='M24', tickformat='%Y', ticklabelmode='period')
+        return fig
+    return cached_figure('relative_value', spec, build)
+
+def horizon_bars(series, years, value, amount=SIP_AMOUNT, thresholds=None):
+    # Grouped bars of 'invested' or 'xirr' (in %) per horizon; series are (strategy, name, colour).
+    # thresholds maps a strategy to the σ multipliers of its buy rules, see ETLManager.what_if.
+    thresholds = thresholds or {}
+    spec = {'series': series, 'years': years, 'value': value, 'amount': amount, 'thresholds': thresholds}
+
+    def build():
+        import plotly.graph_objects as go
+        from utils.data_etl import ETLManager
+        etl = ETLManager()
+        bars = []
+        for strategy, name, color in series:
+            results = etl.what_if(strategy, years, amount, thresholds.get(strategy))[value]
+            y = (results*100).round(1).tolist() if value == 'xirr' else results.tolist()
+            bars.append(go.Bar(name=name, x=years, y=y, marker_color=color))
+        fig = go.Figure(data=bars)
+        fig.update_layout(barmode='group')
+        fig.update_layout(bargroupgap=0.2)
+        _horizon_axis(fig, years)
+        return fig
+    return cached_figure('horizon_bars', spec, build)
+
+def backtest_box(labels, years, colors):
+    # XIRR spread over every start month of the rolling-start backtest; labels map strategy -> name
+    spec = {'labels': labels, 'years': years, 'colors': colors}
+
+    def build():
+        import plotly.express as px
+        from utils.data_etl import ETLManager
+        backtest = ETLManager().rolling_backtest(years, list(labels))
+        backtest = backtest.assign(xirr=backtest['xirr']*100, strategy=backtest['strategy'].map(labels))
+        fig = px.box(backtest, x='horizon', y='xirr', color='strategy', points=False, color_discrete_sequence=colors)
+        fig.update_layout(xaxis_title='', yaxis_title='XIRR (%)', boxgroupgap=0.2)
+        _horizon_axis(fig, years)
+        fig.update_layout(legend = {"title": None})
+        return fig
+    return cached_figure('backtest_box', spec, build)
+
+def sweep_heatmap(pause_multipliers, switch_multipliers, years, horizon):
+    # Median XIRR over the (k1, k2) threshold grid for one horizon, see ETLManager.threshold_sweep
+    spec = {'pause': pause_multipliers, 'switch': switch_multipliers, 'years': years, 'horizon': horizon}
+
+    def build():
+        import plotly.graph_objects as go
+        from utils.data_etl import ETLManager
+        sweep = ETLManager().threshold_sweep(pause_multipliers, switch_multipliers, years)
+        median_xirr, invested = summarize(sweep, horizon)
+        fig = go.Figure(data=go.Heatmap(
+            z=median_xirr*100, x=[f'{k}σ' for k in switch_multipliers], y=[f'{k}σ' for k in pause_multipliers],
+            customdata=invested, colorscale='Purples', texttemplate='%{z:.1f}',
+            hovertemplate='Pause above: %{y}<br>Switch above: %{x}<br>Median XIRR: %{z:.1f}%<br>Avg. invested: ₹%{customdata:,.0f}<extra></extra>'
+        ))
+        fig.update_layout(xaxis_title='Invest in Largecap above (k2)', yaxis_title='Pause Smallcap above (k1)')
+        return fig
+    return cached_figure('sweep_heatmap', spec, build)
+
+def simulation_box(series, value, paths, years, block_months, seed):
+    # Spread of 'xirr' or 'max_drawdown' (in %) over the simulated paths, drawn from the P5, P25,
+    # median, P75 and P95 rather than every path; series are (strategy, name, colour)
+    spec = {'series': series, 'value': value, 'paths': paths, 'years': years, 'block_months': block_months, 'seed': seed}
+
+    def build():
+        import plotly.graph_objects as go
+        from utils.data_etl import ETLManager
+        simulation = ETLManager().monte_carlo([strategy for strategy, _, _ in series], paths, years, block_months, seed)
+        fig = go.Figure()
+        for strategy, name, color in series:
+            p5, p25, median, p75, p95 = np.nanpercentile(simulation[strategy][value]*100, [5, 25, 50, 75, 95])
+            fig.add_trace(go.Box(name=name, q1=[p25], median=[median], q3=[p75], lowerfence=[p5], upperfence=[p95], marker_color=color))
+        fig.update_layout(yaxis_title='XIRR (%)' if value == 'xirr' else 'Maximum drawdown (%)', showlegend=False)
+        return fig
+    return cached_figure('simulation_box', spec, build)
@@ -0,0 +1,122 @@
+import configparser
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Process-wide timing spans and cache hit/miss counters for the hot paths. Collection is off
+# unless [METRICS] enabled is set in conf.ini, or collect_here() turns it on for the calling
+# thread only (a session that opened the sidebar panel); while off, span() hands back a shared
+# no-op context manager and count() returns immediately.
+
+_config = configparser.ConfigParser()
+_config.read(os.path.dirname(__file__) + '/conf.ini')
+_enabled = _config.getboolean('METRICS', 'enabled', fallback=False)
+
+_lock = threading.Lock()
+_spans = {}     # name -> [count, total seconds, max seconds]
+_counters = {}  # (cache, outcome) -> count
+_NOOP = nullcontext()
+_local = threading.local()
+
+def enabled():
+    return _enabled
+
+def collect_here(on=True):
+    _local.on = on
+
+def _collecting():
+    return _enabled or getattr(_local, 'on', False)
+
+class _Span:
+    __slots__ = ('name', 'begin')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.begin
+        with _lock:
+            stats = _spans.get(self.name)
+            if stats is None:
+                _spans[self.name] = [1, elapsed, elapsed]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+        return False
+
+def span(name):
+    return _Span(name) if _collecting() else _NOOP
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _collecting():
+                return function(*args, **kwargs)
+            with _Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(cache, outcome):
+    if not _collecting():
+        return
+    with _lock:
+        _counters[(cache, outcome)] = _counters.get((cache, outcome), 0) + 1
+
+def hit(cache):
+    count(cache, 'hit')
+
+def miss(cache):
+    count(cache, 'miss')
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+def snapshot():
+    with _lock:
+        spans = {name: {'count': calls, 'total_seconds': total, 'mean_seconds': total/calls, 'max_seconds': longest}
+                 for name, (calls, total, longest) in sorted(_spans.items())}
+        caches = {}
+        for (cache, outcome), value in sorted(_counters.items()):
+            caches.setdefault(cache, {'hit': 0, 'miss': 0})[outcome] = value
+    return {'enabled': _enabled, 'spans': spans, 'caches': caches}
+
+def to_json():
+    return json.dumps(snapshot(), indent=2)
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(prefix='smallcap'):
+    # Prometheus text exposition format
+    metrics = snapshot()
+    lines = [
+        f'# HELP {prefix}_stage_seconds Time spent in each hot-path stage.',
+        f'# TYPE {prefix}_stage_seconds summary',
+    ]
+    for name, stats in metrics['spans'].items():
+        lines.append(f'{prefix}_stage_seconds_sum{{stage="{_label(name)}"}} {stats["total_seconds"]!r}')
+        lines.append(f'{prefix}_stage_seconds_count{{stage="{_label(name)}"}} {stats["count"]}')
+    lines += [
+        f'# HELP {prefix}_stage_max_seconds Longest single run of each hot-path stage.',
+        f'# TYPE {prefix}_stage_max_seconds gauge',
+    ]
+    lines += [f'{prefix}_stage_max_seconds{{stage="{_label(name)}"}} {stats["max_seconds"]!r}' for name, stats in metrics['spans'].items()]
+    lines += [
+        f'# HELP {prefix}_cache_lookups_total Cache lookups by outcome.',
+        f'# TYPE {prefix}_cache_lookups_total counter',
+    ]
+    for cache, outcomes in metrics['caches'].items():
+        lines += [f'{prefix}_cache_lookups_total{{cache="{_label(cache)}",outcome="{outcome}"}} {value}' for outcome, value in outcomes.items()]
+    return '\n'.join(lines) + '\n'
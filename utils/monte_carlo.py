@@ -0,0 +1,94 @@
+import configparser
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils import metrics
+from utils.sip_engine import SIP_AMOUNT, accumulate, buy_mask
+from utils.xirr import xirr_batch
+
+# Stress test of the strategies on synthetic futures. The joint monthly growth of the TRI
+# series is resampled in blocks of consecutive months (a moving block bootstrap, which keeps
+# the co-movement of the indices and some of their momentum), every path starts from the
+# latest relative_value and every strategy is run over all paths at once as (paths x months)
+# arrays. Paths are simulated in fixed-size shards, each with its own child seed, so a seed
+# gives the same paths whatever the number of worker processes.
+
+def _config():
+    config = configparser.ConfigParser()
+    config.read(os.path.dirname(__file__) + '/conf.ini')
+    return config
+
+def block_indices(length, paths, months, block_months, rng):
+    # (paths x months) row indices into a series of length rows, as runs of block_months
+    # consecutive rows starting at uniformly drawn rows
+    block_months = min(block_months, length)
+    blocks = -(-months // block_months)
+    starts = rng.integers(0, length - block_months + 1, size=(paths, blocks))
+    return (starts[:, :, None] + np.arange(block_months)).reshape(paths, -1)[:, :months]
+
+def _simulate_shard(arrays, sleeves, paths, months, block_months, seed):
+    rng = np.random.default_rng(seed)
+    # Month 0 is the latest month itself; the months after it are drawn
+    index = block_indices(len(arrays['growth']), paths, months - 1, block_months, rng)
+    tri_ratio = {column: np.ones((paths, months)) for column in arrays['columns']}
+    for i, column in enumerate(arrays['columns']):
+        tri_ratio[column][:, 1:] = arrays['growth'][index, i]
+    relative_value = arrays['relative_value'] * np.cumprod(tri_ratio['nifty_smallcap250_tri'] / tri_ratio['nifty50_tri'], axis=1)
+
+    results = {}
+    for strategy, strategy_sleeves in sleeves.items():
+        ratio = np.stack([tri_ratio[column] for column, _, _ in strategy_sleeves])
+        cashflow = np.stack([np.where(buy_mask(rule, relative_value, arrays['std_dev']), SIP_AMOUNT, 0.0) for _, rule, _ in strategy_sleeves])
+        initial = np.array([value for _, _, value in strategy_sleeves], dtype=np.float64)[:, None]
+        present_value = accumulate(ratio, cashflow, initial)
+        # Valued like the returns_from_* methods: each sleeve at its peak over the horizon
+        final_value = present_value.max(axis=-1).sum(axis=0)
+        total_cashflow = cashflow.sum(axis=0)
+        invested = total_cashflow.sum(axis=1)
+        total_cashflow[:, -1] -= final_value
+        value = present_value.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdown = np.nan_to_num(1 - value / np.maximum.accumulate(value, axis=1)).max(axis=1)
+        results[strategy] = {'xirr': xirr_batch(arrays['dates'], total_cashflow), 'max_drawdown': drawdown,
+                             'invested': invested, 'final_value': final_value}
+    return results
+
+def simulate(arrays, sleeves, paths=10000, years=10, block_months=12, seed=0, max_workers=None, shard_paths=1000):
+    # XIRR, maximum drawdown, invested amount and final value of every strategy on every path,
+    # as {strategy: {metric: array over paths}}. arrays holds the historical monthly 'growth'
+    # (months x columns) of the TRI 'columns', the latest 'relative_value' and 'date', and the
+    # 'std_dev' the buy rules use; sleeves maps each strategy to its (column, rule, starting value).
+    months = int(years*12)
+    last = np.datetime64(arrays['date'], 'D')
+    month = last.astype('datetime64[M]')
+    arrays = dict(arrays, dates=(month + np.arange(months)).astype('datetime64[D]') + (last - month.astype('datetime64[D]')))
+    shards = [min(shard_paths, paths - start) for start in range(0, paths, shard_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+    config = _config()
+    max_workers = max_workers or config.getint('MONTECARLO', 'max_workers', fallback=0) or os.cpu_count()
+    with metrics.span('monte_carlo.simulate'):
+        # Starting worker processes costs about a second, more than 10k paths take in one process
+        if max_workers > 1 and len(shards) > 1 and paths >= config.getint('MONTECARLO', 'pool_paths', fallback=20000):
+            # spawn rather than fork, like the threshold sweep
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(shards)), mp_context=multiprocessing.get_context('spawn')) as executor:
+                results = list(executor.map(_simulate_shard, [arrays]*len(shards), [sleeves]*len(shards), shards,
+                                            [months]*len(shards), [block_months]*len(shards), seeds))
+        else:
+            results = [_simulate_shard(arrays, sleeves, shard, months, block_months, shard_seed) for shard, shard_seed in zip(shards, seeds)]
+    return {strategy: {name: np.concatenate([result[strategy][name] for result in results]) for name in results[0][strategy]}
+            for strategy in sleeves}
+
+def summarize(simulation, benchmark='nifty_smallcap250', percentiles=(5, 25, 50, 75, 95)):
+    # Per strategy: XIRR and maximum drawdown percentiles over the paths, the share of paths
+    # that lost money and the share that beat the benchmark on the same path
+    rows = []
+    for strategy, results in simulation.items():
+        row = {'strategy': strategy, 'paths': len(results['xirr']), 'invested': results['invested'].mean()}
+        for name in ['xirr', 'max_drawdown']:
+            for percentile, value in zip(percentiles, np.nanpercentile(results[name], percentiles)):
+                row[f'{name}_p{percentile}'] = value
+        row['loss_rate'] = np.mean(results['xirr'] < 0)
+        row['win_rate'] = np.mean(results['xirr'] > simulation[benchmark]['xirr']) if benchmark in simulation and strategy != benchmark else np.nan
+        rows.append(row)
+    return rows
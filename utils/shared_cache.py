@@ -0,0 +1,196 @@
+import configparser
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from utils import metrics
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): single-flight then only holds between the threads of one process
+    fcntl = None
+
+# Host-wide cache of raw niftyindices responses shared by every server process, report run and
+# restart. One file per entry, written atomically; a miss takes the key's lock file so that
+# concurrent misses for the same request, in any process, make one upstream call and the rest
+# read its result. Entries for dates NSE has not published yet expire at the next end-of-day
+# publication, entries for fully published history never do. The directory is kept under
+# max_mb by evicting the least recently used entries.
+
+IST = timezone(timedelta(hours=5, minutes=30))
+_LOCK_STRIPES = 64
+
+@contextmanager
+def file_lock(lock_path, thread_lock):
+    # Exclusive across the threads of this process (thread_lock) and across processes (flock on lock_path)
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+class SharedCache:
+    def __init__(self, path=None, max_bytes=None, publish_time=None):
+        config = configparser.ConfigParser()
+        config.read(os.path.dirname(__file__) + '/conf.ini')
+        if path is None:
+            path = os.path.join(os.path.dirname(os.path.dirname(__file__)), config.get('SHAREDCACHE', 'path', fallback='.shared_cache'))
+        self.path = path
+        self.max_bytes = max_bytes if max_bytes is not None else config.getint('SHAREDCACHE', 'max_mb', fallback=256) * 2**20
+        publish_time = publish_time or config.get('SHAREDCACHE', 'publish_time', fallback='19:00')
+        self.publish_time = datetime.strptime(publish_time, '%H:%M').time()
+        self._thread_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._evict_lock = threading.Lock()
+
+    def _digest(self, key):
+        return hashlib.blake2b(json.dumps(key, sort_keys=True, default=str).encode(), digest_size=16).hexdigest()
+
+    def _entry_path(self, digest):
+        return os.path.join(self.path, digest[:2], digest + '.entry')
+
+    def _locked(self, name, thread_lock):
+        return file_lock(os.path.join(self.path, 'locks', name), thread_lock)
+
+    def _key_lock(self, digest):
+        # A fixed set of striped lock files, so none is ever unlinked while another process waits on it
+        stripe = int(digest[:8], 16) % _LOCK_STRIPES
+        return self._locked(f'{stripe}.lock', self._thread_locks[stripe])
+
+    def _read(self, digest):
+        # Entry layout: one JSON header line ({"expires": epoch seconds or null, "crc": crc32}), then the payload
+        path = self._entry_path(digest)
+        try:
+            with open(path, 'rb') as file:
+                header = json.loads(file.readline())
+                payload = file.read()
+            if header['expires'] is not None and header['expires'] <= time.time() or zlib.crc32(payload) != header['crc']:
+                self._remove(path)
+                return None
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        try:
+            # Access time for the LRU order; atime itself is unreliable on noatime mounts
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return payload
+
+    def _write(self, digest, payload, expires):
+        path = self._entry_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(json.dumps({'expires': expires, 'crc': zlib.crc32(payload)}).encode() + b'\n')
+            file.write(payload)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _entries(self):
+        for shard in os.scandir(self.path):
+            if shard.is_dir() and shard.name != 'locks':
+                for entry in os.scandir(shard.path):
+                    if entry.name.endswith('.entry'):
+                        yield entry
+
+    def evict(self):
+        # Drop least recently used entries until the directory fits in max_bytes
+        with self._locked('evict.lock', self._evict_lock):
+            entries = []
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+
+    def clear(self, volatile_only=False):
+        # volatile_only keeps the entries of fully published history
+        if not os.path.isdir(self.path):
+            return
+        for entry in list(self._entries()):
+            if volatile_only:
+                try:
+                    with open(entry.path, 'rb') as file:
+                        if json.loads(file.readline())['expires'] is None:
+                            continue
+                except (FileNotFoundError, ValueError, KeyError):
+                    pass
+            self._remove(entry.path)
+
+    def get(self, key):
+        return self._read(self._digest(key))
+
+    def get_or_fetch(self, key, fetch, expires=None):
+        # expires is an epoch time, None for never; fetch() returns bytes and is only called on a miss
+        digest = self._digest(key)
+        payload = self._read(digest)
+        if payload is not None:
+            metrics.hit('shared_cache')
+            return payload
+        with self._key_lock(digest):
+            # Whoever held the lock before us may just have fetched it
+            payload = self._read(digest)
+            if payload is not None:
+                metrics.hit('shared_cache')
+                return payload
+            metrics.miss('shared_cache')
+            payload = fetch()
+            self._write(digest, payload, expires)
+        self.evict()
+        return payload
+
+    def _next_publication(self, now):
+        day = now.date() if now.time() < self.publish_time else now.date() + timedelta(days=1)
+        while day.weekday() >= 5:
+            day += timedelta(days=1)
+        return datetime.combine(day, self.publish_time, IST)
+
+    def expiry(self, end_date, now=None):
+        # When a response covering up to end_date can change: never once every trading day up to
+        # end_date has been published, otherwise at the next NSE end-of-day publication. Exchange
+        # holidays are not known here, they only cost one refetch after the publication time.
+        now = (now or datetime.now(IST)).astimezone(IST)
+        publication = self._next_publication(now)
+        if end_date < publication.date():
+            return None
+        return publication.timestamp()
+
+_shared = None
+_shared_lock = threading.Lock()
+
+def shared_cache():
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedCache()
+    return _shared
+
+def set_shared_cache(cache):
+    # Swap the process-wide cache, e.g. for an isolated one in the benchmarks; returns the previous one
+    global _shared
+    with _shared_lock:
+        previous, _shared = _shared, cache
+    return previous
@@ -0,0 +1,41 @@
+import numpy as np
+
+# Mean and standard deviation of a series that only ever look backwards, so a decision taken
+# in month i uses months 0..i alone. Both come from one pass of prefix sums over the series
+# shifted by its first value (the shifted-data form of the one-pass variance update), which
+# keeps the subtraction well conditioned and lets every window length share the same sums.
+
+def _prefix_sums(values):
+    values = np.asarray(values, dtype=np.float64)
+    shifted = values - values[0] if len(values) else values
+    zero = np.zeros(1)
+    return values[0] if len(values) else 0.0, np.concatenate([zero, np.cumsum(shifted)]), np.concatenate([zero, np.cumsum(shifted*shifted)])
+
+def _moments(shift, total, total_squares, count, ddof, min_periods):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = shift + total / count
+        variance = np.clip(total_squares - total*total/count, 0, None) / (count - ddof)
+    enough = count >= max(min_periods, ddof + 1)
+    return np.where(enough, mean, np.nan), np.where(enough, np.sqrt(variance), np.nan)
+
+def expanding_bands(values, ddof=1, min_periods=2):
+    # Mean and std of values[0..i] for every i
+    shift, total, total_squares = _prefix_sums(values)
+    count = np.arange(1, len(total), dtype=np.float64)
+    return _moments(shift, total[1:], total_squares[1:], count, ddof, min_periods)
+
+def rolling_bands(values, windows, ddof=1, min_periods=None):
+    # Mean and std of the trailing window of every length in windows, as (windows x time)
+    # matrices; months before a full window is available are NaN unless min_periods is given
+    shift, total, total_squares = _prefix_sums(values)
+    windows = np.atleast_1d(np.asarray(windows, dtype=np.int64))
+    end = np.arange(1, len(total))
+    begin = np.maximum(end[None, :] - windows[:, None], 0)
+    count = (end[None, :] - begin).astype(np.float64)
+    window_total = total[end][None, :] - total[begin]
+    window_squares = total_squares[end][None, :] - total_squares[begin]
+    mean, std = _moments(shift, window_total, window_squares, count, ddof, 2 if min_periods is None else min_periods)
+    if min_periods is None:
+        partial = count < windows[:, None]
+        mean[partial], std[partial] = np.nan, np.nan
+    return mean, std
@@ -0,0 +1,82 @@
+import numpy as np
+
+SIP_AMOUNT = 10000
+
+def buy_mask(rule, relative_value, std_dev):
+    # rule is None to always buy, or (comparison, k) to buy while relative_value is below ('<')
+    # or above ('>') 1 + kσ
+    if rule is None:
+        return np.ones(np.shape(relative_value), dtype=bool)
+    comparison, k = rule
+    threshold = 1 + k*std_dev
+    return relative_value < threshold if comparison == '<' else relative_value > threshold
+
+def tri_ratios(tri):
+    # Period-on-period growth of each TRI series, with the first period pinned to 1
+    tri = np.asarray(tri, dtype=np.float64)
+    ratio = np.ones_like(tri)
+    np.divide(tri[..., 1:], tri[..., :-1], out=ratio[..., 1:])
+    return ratio
+
+def growth_prefix(tri_ratio):
+    # growth[i] = prod(tri_ratio[1..i]): the value at i of one unit invested at the start
+    growth = np.array(tri_ratio, dtype=np.float64)
+    growth[..., 0] = 1.0
+    np.cumprod(growth, axis=-1, out=growth)
+    return growth
+
+def accumulate(tri_ratio, cashflow, initial):
+    # Closed form of present_value[i] = present_value[i-1] * tri_ratio[i] + cashflow[i]
+    # for every sleeve at once. The last axis is time, leading axes are sleeves / paths.
+    # With growth[i] = prod(tri_ratio[1..i]), the recurrence unrolls to
+    # present_value[i] = growth[i] * (initial + sum(cashflow[1..i] / growth[1..i])).
+    cashflow = np.asarray(cashflow, dtype=np.float64)
+    growth = growth_prefix(tri_ratio)
+    units = np.divide(cashflow, growth)
+    units[..., 0] = initial
+    np.cumsum(units, axis=-1, out=units)
+    return np.multiply(growth, units, out=units)
+
+def accumulate_windows(tri_ratio, cashflow, initial, starts, growth=None):
+    # accumulate() restarted at every index in starts, sharing one cumulative product and one
+    # running sum of units across all windows. Returns (..., len(starts), time) with NaN
+    # before each window's start; window s at time i is
+    # growth[i] * (initial / growth[s] + units[i] - units[s]). growth, if given, is the
+    # already computed growth_prefix(tri_ratio) and tri_ratio is not used.
+    cashflow = np.asarray(cashflow, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    if growth is None:
+        growth = growth_prefix(tri_ratio)
+    units = np.cumsum(cashflow / growth, axis=-1)
+    initial = np.asarray(initial, dtype=np.float64)[..., None]
+    offset = initial / growth[..., starts] - units[..., starts]
+    present_value = growth[..., None, :] * (units[..., None, :] + offset[..., None])
+    before_start = np.arange(growth.shape[-1]) < starts[:, None]
+    present_value[..., before_start] = np.nan
+    return present_value
+
+def rolling_windows(length, months):
+    # Start and end index of every window of each length in months that fits in the series
+    months = [month for month in months if month <= length]
+    counts = [length - month + 1 for month in months]
+    window_start = np.concatenate([np.arange(count) for count in counts] + [np.empty(0, dtype=np.int64)])
+    window_end = window_start + np.repeat(np.array(months, dtype=np.int64), counts) - 1
+    return window_start, window_end
+
+def window_values(tri_ratio, cashflow, initial, window_start, window_end):
+    # Final value of the (sleeves x time) SIP for every window, valued like the returns_from_*
+    # methods: each sleeve at its peak within the window. A SIP is started at every month once
+    # and reduced to its running peak, so any number of windows costs a lookup.
+    length = tri_ratio.shape[-1]
+    present_value = accumulate_windows(tri_ratio, cashflow, initial, np.arange(length))
+    peak_value = np.fmax.accumulate(present_value, axis=-1).sum(axis=0)
+    return peak_value[window_start, window_end]
+
+def window_cashflows(total_cashflow, window_start, window_end, final_value):
+    # One row per window on the shared grid: the SIP cashflows inside the window closed by the
+    # final value as an outflow on its last date, ready for xirr_batch
+    columns = np.arange(len(total_cashflow))
+    in_window = (columns >= window_start[:, None]) & (columns <= window_end[:, None])
+    cashflows = np.where(in_window, total_cashflow, 0.0)
+    cashflows[np.arange(len(window_end)), window_end] -= final_value
+    return cashflows
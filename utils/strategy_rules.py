@@ -0,0 +1,88 @@
+import hashlib
+import re
+from collections import namedtuple
+import numpy as np
+
+# A strategy is a list of rules, one per line, each one an independent SIP sleeve:
+#
+#   invest 10000 in nifty_smallcap250 when relative_value < 1 + 1σ
+#   invest 10000 in nifty50 when relative_value > 1 + 2σ and relative_value < 1 + 3σ
+#   invest 5000 in nifty50
+#
+# Conditions compare relative_value against a number or a sigma band (1 + 1.5σ, 1 - σ; a bare
+# 2σ or -σ is the band around 1, as the charts label it, and 'sigma' may be written instead of
+# 'σ') and can be joined with 'and' / 'or', where 'and' binds tighter. Lines starting with '#'
+# are comments.
+
+Rule = namedtuple('Rule', ['key', 'amount', 'target', 'condition', 'text'])
+
+TARGETS = {'nifty50': 'nifty50_tri', 'nifty_smallcap250': 'nifty_smallcap250_tri'}
+
+_RULE_PATTERN = re.compile(r'^invest\s+(?P<amount>[\d,_]*\.?\d+)\s+in\s+(?P<target>\w+)(?:\s+when\s+(?P<condition>.+))?$', re.IGNORECASE)
+_COMPARISON_PATTERN = re.compile(r'^(?P<series>relative_value)\s*(?P<op><=|>=|<|>)\s*(?P<bound>.+)$')
+_BOUND_PATTERNS = [
+    re.compile(r'(?P<base>\d*\.?\d+)'),
+    re.compile(r'(?P<sign>[-+])?(?P<multiplier>\d*\.?\d+)?σ'),
+    re.compile(r'(?P<base>\d*\.?\d+)(?P<sign>[-+])(?P<multiplier>\d*\.?\d+)?σ'),
+]
+_OPERATORS = {'<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal}
+
+class RuleError(ValueError):
+    pass
+
+def _parse_bound(text, line_number):
+    # A bound is 'a', '±kσ' (short for 1 ± kσ) or 'a ± kσ' and is returned as (a, ±k)
+    bound = re.sub('sigma', 'σ', text, flags=re.IGNORECASE).replace(' ', '').replace('*', '')
+    for pattern in _BOUND_PATTERNS:
+        match = pattern.fullmatch(bound)
+        if match:
+            groups = match.groupdict()
+            multiplier = float(groups['multiplier'] or 1) if 'multiplier' in groups else 0.0
+            return float(groups.get('base') or 1), -multiplier if groups.get('sign') == '-' else multiplier
+    raise RuleError(f"Line {line_number}: cannot read the bound '{text.strip()}'")
+
+def _parse_condition(text, line_number):
+    # Alternatives joined by 'or', each a tuple of comparisons joined by 'and'
+    alternatives = []
+    for alternative in re.split(r'\s+or\s+', text.strip(), flags=re.IGNORECASE):
+        comparisons = []
+        for comparison in re.split(r'\s+and\s+', alternative, flags=re.IGNORECASE):
+            match = _COMPARISON_PATTERN.match(comparison.strip())
+            if not match:
+                raise RuleError(f"Line {line_number}: cannot read the condition '{comparison.strip()}'")
+            comparisons.append((match['series'], match['op'], _parse_bound(match['bound'], line_number)))
+        alternatives.append(tuple(comparisons))
+    return tuple(alternatives)
+
+def parse_rules(text):
+    rules = []
+    for line_number, line in enumerate(text.splitlines(), start=1):
+        line = ' '.join(line.split())
+        if not line or line.startswith('#'):
+            continue
+        match = _RULE_PATTERN.match(line)
+        if not match:
+            raise RuleError(f"Line {line_number}: expected 'invest <amount> in <index> [when <condition>]'")
+        target = match['target'].lower()
+        if target not in TARGETS:
+            raise RuleError(f"Line {line_number}: unknown index '{match['target']}', expected one of {', '.join(TARGETS)}")
+        amount = float(match['amount'].replace(',', '').replace('_', ''))
+        condition = _parse_condition(match['condition'], line_number) if match['condition'] else ()
+        # Rules are cached by what they mean, not how they are spelled
+        key = hashlib.blake2b(repr((amount, target, condition)).encode(), digest_size=8).hexdigest()
+        rules.append(Rule(key, amount, target, condition, line))
+    if not rules:
+        raise RuleError('Add at least one rule')
+    return rules
+
+def compile_mask(rule, relative_value, std_dev):
+    # Boolean buy mask of a rule over the whole SIP series
+    if not rule.condition:
+        return np.ones(len(relative_value), dtype=bool)
+    mask = np.zeros(len(relative_value), dtype=bool)
+    for comparisons in rule.condition:
+        matched = np.ones(len(relative_value), dtype=bool)
+        for _, op, (base, multiplier) in comparisons:
+            matched &= _OPERATORS[op](relative_value, base + multiplier*std_dev)
+        mask |= matched
+    return mask
@@ -0,0 +1,98 @@
+import configparser
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils import metrics
+from utils.sip_engine import SIP_AMOUNT, rolling_windows, tri_ratios, window_cashflows, window_values
+from utils.xirr import xirr_batch
+
+# The k1 x k2 grid shown on the Strategy 2 page
+PAUSE_MULTIPLIERS = [0.5, 0.75, 1, 1.25, 1.5, 1.75, 2]
+SWITCH_MULTIPLIERS = [1, 1.25, 1.5, 1.75, 2, 2.25, 2.5, 2.75, 3]
+
+def _config():
+    config = configparser.ConfigParser()
+    config.read(os.path.dirname(__file__) + '/conf.ini')
+    return config
+
+def _sweep_rows(arrays, pause_multipliers, switch_multipliers, window_start, window_end):
+    # Strategy 2 rules for every (k1, k2) pair in the chunk: keep the smallcap SIP going while
+    # relative_value < 1 + k1 * sigma and divert it to the Nifty 50 while relative_value > 1 + k2 * sigma
+    relative_value, std_dev = arrays['relative_value'], arrays['std_dev']
+    tri_ratio = tri_ratios(np.vstack([arrays['nifty_smallcap250_tri'], arrays['nifty50_tri']]))
+    initial = np.array([SIP_AMOUNT, 0], dtype=np.float64)
+    xirr, invested = [], []
+    for pause in pause_multipliers:
+        for switch in switch_multipliers:
+            cashflow = np.vstack([
+                np.where(relative_value < (1+pause*std_dev), SIP_AMOUNT, 0),
+                np.where(relative_value > (1+switch*std_dev), SIP_AMOUNT, 0),
+            ]).astype(np.float64)
+            final_value = window_values(tri_ratio, cashflow, initial, window_start, window_end)
+            cashflows = window_cashflows(cashflow.sum(axis=0), window_start, window_end, final_value)
+            invested.append(cashflows.sum(axis=1) + final_value)
+            xirr.append(xirr_batch(arrays['dates'], cashflows))
+    shape = (len(pause_multipliers), len(switch_multipliers), len(window_start))
+    return np.reshape(xirr, shape), np.reshape(invested, shape)
+
+def threshold_sweep(arrays, version, pause_multipliers, switch_multipliers, horizons, max_workers=None, cache_path=None):
+    # Result cube over (pause multiplier k1, switch multiplier k2, window) for every start month
+    # of every horizon, with XIRR and capital deployed. Each k1 row runs in its own process and
+    # finished cubes are kept on disk, keyed by the data version and the grid spec; writing a
+    # cube removes those of every other data version, which are never read again.
+    config = _config()
+    pause_multipliers = [float(value) for value in pause_multipliers]
+    switch_multipliers = [float(value) for value in switch_multipliers]
+    horizons = [int(horizon) for horizon in horizons]
+    sigma = hashlib.blake2b(np.asarray(arrays['std_dev'], dtype=np.float64).tobytes(), digest_size=8).hexdigest()
+    spec = json.dumps({'version': version, 'sigma': sigma, 'pause': pause_multipliers, 'switch': switch_multipliers, 'horizons': horizons})
+    cache_path = cache_path or os.path.join(os.path.dirname(os.path.dirname(__file__)), config.get('SWEEP', 'cache_path'))
+    cache_file = os.path.join(cache_path, f"{version}-{hashlib.blake2b(spec.encode(), digest_size=12).hexdigest()}.npz")
+    if os.path.exists(cache_file):
+        metrics.hit('sweep_cache')
+        with np.load(cache_file) as cached:
+            return dict(cached)
+    metrics.miss('sweep_cache')
+
+    window_start, window_end = rolling_windows(len(arrays['dates']), [horizon*12 for horizon in horizons])
+    max_workers = max_workers or config.getint('SWEEP', 'max_workers', fallback=0) or os.cpu_count()
+    chunks = [[pause] for pause in pause_multipliers]
+    if max_workers > 1 and len(chunks) > 1:
+        # spawn rather than fork: the Streamlit server that calls this is multi-threaded
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks)), mp_context=multiprocessing.get_context('spawn')) as executor:
+            results = list(executor.map(_sweep_rows, [arrays]*len(chunks), chunks, [switch_multipliers]*len(chunks),
+                                        [window_start]*len(chunks), [window_end]*len(chunks)))
+    else:
+        results = [_sweep_rows(arrays, chunk, switch_multipliers, window_start, window_end) for chunk in chunks]
+
+    cube = {
+        'pause_multipliers': np.array(pause_multipliers),
+        'switch_multipliers': np.array(switch_multipliers),
+        'horizon': (window_end - window_start + 1) // 12,
+        'start_date': arrays['dates'][window_start],
+        'xirr': np.concatenate([xirr for xirr, _ in results]),
+        'invested': np.concatenate([invested for _, invested in results]),
+    }
+    os.makedirs(cache_path, exist_ok=True)
+    temporary_file = cache_file + f'.{os.getpid()}.tmp.npz'
+    np.savez(temporary_file, **cube)
+    os.replace(temporary_file, cache_file)
+    _prune(cache_path, version)
+    return cube
+
+def _prune(cache_path, version):
+    # The data version changes with every new trading day, so without this the directory only grows
+    for entry in os.scandir(cache_path):
+        if entry.name.endswith('.npz') and not entry.name.startswith(f'{version}-'):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+def summarize(cube, horizon):
+    # (k1 x k2) median XIRR and mean capital deployed across all start months of one horizon
+    windows = cube['horizon'] == horizon
+    return np.nanmedian(cube['xirr'][:, :, windows], axis=-1), cube['invested'][:, :, windows].mean(axis=-1)
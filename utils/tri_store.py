@@ -0,0 +1,137 @@
+import configparser
+import os
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from requests import RequestException
+from utils import metrics
+from utils.api_manager import NIFTYIndices, total_returns_frame
+from utils.shared_cache import file_lock
+
+_append_listeners = []
+
+def on_append(callback):
+    # callback(index_name, rows) runs after rows are appended to any store, e.g. to drop data derived from it
+    _append_listeners.append(callback)
+
+class TRIStore:
+    # Append-only columnar history of index TRI values, one directory per index holding a
+    # raw int64 column of dates (days since epoch) and a raw float64 column of TRI values.
+    # Both columns are memory-mapped on read, so a warm start never touches the network.
+    COLUMNS = {'date': np.dtype('<i8'), 'tri': np.dtype('<f8')}
+    _append_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        if path is None:
+            config = configparser.ConfigParser()
+            config.read(os.path.dirname(__file__) + '/conf.ini')
+            path = os.path.join(os.path.dirname(os.path.dirname(__file__)), config.get('TRISTORE', 'path'))
+        self.path = path
+
+    def _column_path(self, index_name, column):
+        return os.path.join(self.path, index_name.replace(' ', '_').lower(), column + '.bin')
+
+    def _length(self, index_name):
+        # A crash between the two column appends leaves a ragged tail; only whole rows count
+        sizes = []
+        for column, dtype in self.COLUMNS.items():
+            column_path = self._column_path(index_name, column)
+            sizes.append(os.path.getsize(column_path) // dtype.itemsize if os.path.exists(column_path) else 0)
+        return min(sizes)
+
+    def read(self, index_name):
+        length = self._length(index_name)
+        columns = {}
+        for column, dtype in self.COLUMNS.items():
+            if length == 0:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(self._column_path(index_name, column), dtype=dtype, mode='r', shape=(length,))
+        return columns['date'].view('datetime64[D]'), columns['tri']
+
+    def last_date(self, index_name):
+        dates, _ = self.read(index_name)
+        return dates[-1] if len(dates) else None
+
+    def append(self, index_name, dates, tri):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        tri = np.asarray(tri, dtype=np.float64)
+        order = np.argsort(dates, kind='stable')
+        dates, tri = dates[order], tri[order]
+        keep = np.ones(len(dates), dtype=bool)
+        keep[1:] = dates[1:] != dates[:-1]
+        dates, tri = dates[keep], tri[keep]
+        # The store is shared by every server process and report run on the host: read the last
+        # stored row and append after it under one exclusive lock on the index directory
+        directory = os.path.dirname(self._column_path(index_name, 'date'))
+        with file_lock(os.path.join(directory, '.lock'), self._append_lock):
+            last = self.last_date(index_name)
+            if last is not None:
+                keep = dates > last
+                dates, tri = dates[keep], tri[keep]
+            if len(dates) == 0:
+                return 0
+            length = self._length(index_name)
+            for column, values in [('date', dates.view('<i8')), ('tri', tri)]:
+                with open(self._column_path(index_name, column), 'ab') as file:
+                    file.truncate(length * self.COLUMNS[column].itemsize)
+                    file.write(values.astype(self.COLUMNS[column]).tobytes())
+        for callback in _append_listeners:
+            callback(index_name, len(dates))
+        return len(dates)
+
+    # Store paths with a background refresh in flight in this process
+    _refreshing = set()
+    _refreshing_lock = threading.Lock()
+
+    def refresh_many(self, indices, start_date='01-Apr-2005', end_date=None, background=False):
+        # Fetch only the rows after each index's last stored date, all indices concurrently.
+        # With background, when every index already has stored history it is served at once and
+        # the new rows are fetched on a background thread; readers learn of them through on_append.
+        # Keep serving the stored history when niftyindices is slow, down or sends garbage.
+        end_date = end_date or datetime.today().strftime('%d-%b-%Y')
+        pending = []
+        for symbol, index_name in indices:
+            last = self.last_date(symbol)
+            start = start_date if last is None else (last.astype(datetime) + timedelta(days=1)).strftime('%d-%b-%Y')
+            if datetime.strptime(start, '%d-%b-%Y') <= datetime.strptime(end_date, '%d-%b-%Y'):
+                metrics.miss('tri_store')
+                pending.append((symbol, start, index_name))
+            else:
+                metrics.hit('tri_store')
+        if background and pending and all(self.last_date(symbol) is not None for symbol, _, _ in pending):
+            self._refresh_in_background(pending, end_date)
+        else:
+            self._fetch(pending, end_date)
+        return {symbol: self.load(symbol) for symbol, _ in indices}
+
+    def _fetch(self, pending, end_date):
+        if not pending:
+            return
+        try:
+            fetched = NIFTYIndices('NIFTYINDEXTRI').get_nse_indices_returns_many(pending, end_date)
+        except (RequestException, ValueError):
+            if any(self.last_date(symbol) is None for symbol, _, _ in pending):
+                raise
+            fetched = {}
+        for symbol, frame in fetched.items():
+            if len(frame):
+                self.append(symbol, frame['Date'].to_numpy(dtype='datetime64[D]'), frame['TotalReturnsIndex'].to_numpy())
+
+    def _refresh_in_background(self, pending, end_date):
+        with self._refreshing_lock:
+            if self.path in self._refreshing:
+                return
+            self._refreshing.add(self.path)
+
+        def refresh():
+            try:
+                with metrics.span('tri_store.background_refresh'):
+                    self._fetch(pending, end_date)
+            finally:
+                with self._refreshing_lock:
+                    self._refreshing.discard(self.path)
+        threading.Thread(target=refresh, name='tri-store-refresh', daemon=True).start()
+
+    def load(self, index_name):
+        return total_returns_frame(*self.read(index_name))
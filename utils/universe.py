@@ -0,0 +1,113 @@
+import numpy as np
+from utils.tri_store import TRIStore
+
+# Column name -> niftyindices symbol for the TRI series the universe loader knows about
+NIFTY_TRI_INDICES = {
+    'nifty50': 'NIFTY 50',
+    'nifty_next50': 'NIFTY NEXT 50',
+    'nifty_midcap150': 'NIFTY MIDCAP 150',
+    'nifty_smallcap250': 'NIFTY SMALLCAP 250',
+    'nifty_microcap250': 'NIFTY MICROCAP 250',
+}
+
+class IndexUniverse:
+    # Date-aligned TRI history of any number of indices: one sorted datetime64[D] date
+    # axis and one wide (dates x indices) float64 array, joined on date rather than row position.
+    def __init__(self, dates, tri, names):
+        self.dates = dates
+        self.tri = tri
+        self.names = list(names)
+        self._columns = {name: i for i, name in enumerate(self.names)}
+        self._rel_change = None
+        self._buckets = {}
+
+    @classmethod
+    def from_series(cls, series, how='inner', fill=None):
+        # series: {name: (dates, tri)}. how='inner' keeps dates present in every index,
+        # how='outer' keeps the union with NaN for missing rows, which fill='ffill' carries forward.
+        names = list(series)
+        all_dates = [np.asarray(dates, dtype='datetime64[D]') for dates, _ in series.values()]
+        dates = np.unique(np.concatenate(all_dates)) if all_dates else np.empty(0, dtype='datetime64[D]')
+        tri = np.full((len(dates), len(names)), np.nan)
+        for column, (index_dates, (_, values)) in enumerate(zip(all_dates, series.values())):
+            tri[np.searchsorted(dates, index_dates), column] = values
+        if fill == 'ffill':
+            valid = ~np.isnan(tri)
+            last_valid = np.where(valid, np.arange(len(dates))[:, None], 0)
+            np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+            tri = np.take_along_axis(tri, last_valid, axis=0)
+        if how == 'inner':
+            keep = ~np.isnan(tri).any(axis=1)
+            dates, tri = dates[keep], tri[keep]
+        return cls(dates, tri, names)
+
+    @classmethod
+    def from_frames(cls, frames, how='inner', fill=None):
+        return cls.from_series({name: (frame['Date'].to_numpy(dtype='datetime64[D]'), frame['TotalReturnsIndex'].to_numpy(dtype=np.float64))
+                                for name, frame in frames.items()}, how, fill)
+
+    @classmethod
+    def load(cls, names, start_date='01-Apr-2005', end_date=None, how='inner', fill=None, store=None, background=False):
+        # background: serve stored history right away and fetch newer rows later, see TRIStore.refresh_many
+        store = store or TRIStore()
+        history = store.refresh_many([(NIFTY_TRI_INDICES[name], NIFTY_TRI_INDICES[name]) for name in names], start_date, end_date, background)
+        return cls.from_frames({name: history[NIFTY_TRI_INDICES[name]] for name in names}, how, fill)
+
+    def column(self, name):
+        return self.tri[:, self._columns[name]]
+
+    def rel_change(self, name):
+        # Growth of each index relative to its first available value, computed once for all indices
+        if self._rel_change is None:
+            first_valid = np.argmax(~np.isnan(self.tri), axis=0)
+            self._rel_change = self.tri / self.tri[first_valid, np.arange(len(self.names))]
+        return self._rel_change[:, self._columns[name]]
+
+    def relative_value(self, numerator, denominator):
+        return self.rel_change(numerator) / self.rel_change(denominator)
+
+    def bucket_index(self, frequency):
+        # Row of the first trading day of every SIP period: 'daily', 'weekly' (weeks starting
+        # on Monday), 'monthly', or a day of the month for the first trading day on or after
+        # that day in each month (see _day_of_month_index). Computed once per universe and frequency.
+        if frequency not in self._buckets:
+            if isinstance(frequency, (int, np.integer)) and 1 <= frequency <= 31:
+                self._buckets[frequency] = self._day_of_month_index(int(frequency))
+                return self._buckets[frequency]
+            days = self.dates.astype(np.int64)
+            if frequency == 'daily':
+                key = days
+            elif frequency == 'weekly':
+                key = (days + 3) // 7
+            elif frequency == 'monthly':
+                key = self.dates.astype('datetime64[M]').astype(np.int64)
+            else:
+                raise ValueError(f"Unknown frequency '{frequency}', expected 'daily', 'weekly', 'monthly' or a day of the month")
+            first = np.ones(len(key), dtype=bool)
+            first[1:] = key[1:] != key[:-1]
+            self._buckets[frequency] = np.flatnonzero(first)
+        return self._buckets[frequency]
+
+    def _day_of_month_index(self, day):
+        # Every month invests once: on the first trading day on or after the day (or the month's
+        # last calendar day, for days it does not have), and on its last trading day when the
+        # month has no trading day left by then. The latest month may still be trading, so it
+        # does not roll back and only invests once the day is reached.
+        months = self.dates.astype('datetime64[M]')
+        if not len(months):
+            return np.empty(0, dtype=np.int64)
+        day_of_month = (self.dates - months.astype('datetime64[D]')).astype(np.int64) + 1
+        month_length = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+        first = np.ones(len(months), dtype=bool)
+        first[1:] = months[1:] != months[:-1]
+        month_start = np.flatnonzero(first)
+        month_end = np.append(month_start[1:], len(months)) - 1
+        before = np.add.reduceat((day_of_month < np.minimum(day, month_length)).astype(np.int64), month_start)
+        index = month_start + before
+        if index[-1] > month_end[-1]:
+            index = index[:-1]
+        return np.minimum(index, month_end[:len(index)])
+
+    def sample(self, frequency):
+        index = self.bucket_index(frequency)
+        return IndexUniverse(self.dates[index], self.tri[index], self.names)
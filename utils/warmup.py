@@ -0,0 +1,73 @@
+import threading
+from utils import metrics
+
+# Background warm-up of the process-wide caches, started when the server boots (serve.py) or,
+# failing that, by the first page view. Each stage sets its event when done, so pages only
+# wait for the data they need and render everything else straight away.
+
+STAGES = ['master_data', 'figures', 'backtest']
+
+_events = {stage: threading.Event() for stage in STAGES}
+_lock = threading.Lock()
+_thread = None
+errors = {}
+
+def _master_data():
+    from utils.data_etl import data_version
+    data_version()
+
+def _figures():
+    # The horizon results of every strategy and the figures the pages open with, which also
+    # pays for the plotly imports, templates and validators
+    from utils.data_etl import HORIZONS, STRATEGIES, ETLManager, default_thresholds
+    from utils.figures import RELATIVE_VALUE_CHARTS, horizon_bars, relative_value_chart, strategy_series
+    from utils.sip_engine import SIP_AMOUNT
+    etl = ETLManager()
+    for strategy in STRATEGIES:
+        etl.evaluate_horizons(strategy, HORIZONS)
+    for chart in RELATIVE_VALUE_CHARTS.values():
+        relative_value_chart(**chart)
+    for strategy in ['strategy1', 'strategy2']:
+        for value in ['invested', 'xirr']:
+            horizon_bars(strategy_series(strategy), HORIZONS, value, SIP_AMOUNT, {strategy: default_thresholds(strategy)})
+
+def _backtest():
+    from utils.data_etl import HORIZONS
+    from utils.figures import backtest_box, strategy_series
+    for strategy in ['strategy1', 'strategy2']:
+        series = strategy_series(strategy)
+        backtest_box({key: name for key, name, _ in series}, HORIZONS, [color for _, _, color in series])
+
+def _run():
+    for stage, warm in [('master_data', _master_data), ('figures', _figures), ('backtest', _backtest)]:
+        try:
+            with metrics.span(f'warmup.{stage}'):
+                warm()
+        except Exception as e:
+            # Pages fall back to computing on demand and surface the error themselves
+            errors[stage] = e
+        finally:
+            _events[stage].set()
+
+def start():
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name='cache-warmup', daemon=True)
+            _thread.start()
+    return _thread
+
+def ready(stage='master_data'):
+    return _events[stage].is_set()
+
+def wait(stage='master_data', timeout=None):
+    start()
+    return _events[stage].wait(timeout)
+
+def placeholder(stage='master_data', message='Fetching the latest index data...'):
+    # Show a spinner where the stage's charts go until the warm-up has finished it
+    if ready(stage):
+        return
+    import streamlit as st
+    with st.spinner(message):
+        wait(stage)
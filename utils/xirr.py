@@ -0,0 +1,80 @@
+import numpy as np
+from utils import metrics
+
+DAYS_IN_YEAR = 365.0
+LOG_RATE_BOUNDS = (-10.0, 10.0)
+
+def _npv(log_rate, cashflows, years):
+    # NPV and its derivative in x = log(1 + rate), for every row at once
+    terms = cashflows * np.exp(years * -log_rate[:, None])
+    return terms.sum(axis=1), -np.einsum('ij,ij->i', years, terms)
+
+@metrics.timed('xirr')
+def xirr_batch(dates, cashflows, guess=0.1, tol=1e-12, max_iter=50):
+    # XIRR of every row of a (series x dates) cashflow matrix on one shared date grid, using
+    # the same actual/365 convention as pyxirr. Each row is discounted from its own first
+    # cashflow, so leading zeros are harmless. Rows are solved together with Newton steps in
+    # log(1 + rate); rows that fail to converge fall back to a vectorized sign-change scan
+    # followed by bisection. Rows without a sign change return NaN.
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    cashflows = np.atleast_2d(np.asarray(cashflows, dtype=np.float64))
+    active = cashflows != 0
+    days = (dates - dates.min()).astype(np.float64)
+    first = np.where(active.any(axis=1), np.argmax(active, axis=1), 0)
+    years = np.maximum(days[None, :] - days[first][:, None], 0.0) / DAYS_IN_YEAR
+
+    log_rate = _initial_guess(cashflows, years, guess)
+    # Rows whose cashflows all have one sign have no root and skip the solver altogether
+    solvable = (cashflows > 0).any(axis=1) & (cashflows < 0).any(axis=1)
+    log_rate[~solvable] = np.nan
+    pending = np.flatnonzero(solvable)
+    failed = np.zeros(len(cashflows), dtype=bool)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        for _ in range(max_iter if len(pending) else 0):
+            value, slope = _npv(log_rate[pending], cashflows[pending], years[pending])
+            step = value / slope
+            log_rate[pending] = np.clip(log_rate[pending] - step, *LOG_RATE_BOUNDS)
+            # Steps that leave the bounds or stop being finite are handed to the bisection
+            stuck = ~np.isfinite(log_rate[pending]) | (np.abs(log_rate[pending]) >= LOG_RATE_BOUNDS[1])
+            failed[pending[stuck]] = True
+            pending = pending[~stuck & ~(np.abs(step) < tol)]
+            if not len(pending):
+                break
+    failed[pending] = True
+    failed = np.flatnonzero(failed)
+    if len(failed):
+        log_rate[failed] = _bisect(cashflows[failed], years[failed], tol)
+    return np.expm1(log_rate)
+
+def _initial_guess(cashflows, years, guess):
+    # Collapse each side of the cashflows to one amount at its money-weighted time and solve
+    # that two-flow problem exactly; close to the root for SIP-like series
+    inflow = np.clip(cashflows, 0, None)
+    outflow = np.clip(-cashflows, 0, None)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inflow_total, outflow_total = inflow.sum(axis=1), outflow.sum(axis=1)
+        inflow_time = np.einsum('ij,ij->i', inflow, years) / inflow_total
+        outflow_time = np.einsum('ij,ij->i', outflow, years) / outflow_total
+        log_rate = np.log(outflow_total / inflow_total) / (outflow_time - inflow_time)
+    log_rate = np.where(np.isfinite(log_rate), log_rate, np.log1p(guess))
+    return np.clip(log_rate, *LOG_RATE_BOUNDS)
+
+def _bisect(cashflows, years, tol, points=81):
+    # Scan a grid of log rates for the first sign change of each row, then bisect inside it
+    grid = np.linspace(*LOG_RATE_BOUNDS, points)
+    with np.errstate(over='ignore', invalid='ignore'):
+        values = np.stack([_npv(np.full(len(cashflows), x), cashflows, years)[0] for x in grid], axis=1)
+    change = np.signbit(values[:, :-1]) != np.signbit(values[:, 1:])
+    found = change.any(axis=1)
+    lower_index = np.argmax(change, axis=1)
+    lower, upper = grid[lower_index], grid[lower_index + 1]
+    lower_value = values[np.arange(len(values)), lower_index]
+    with np.errstate(over='ignore', invalid='ignore'):
+        while np.max(upper - lower, initial=0.0) > tol:
+            middle = (lower + upper) / 2
+            middle_value, _ = _npv(middle, cashflows, years)
+            same_side = np.signbit(middle_value) == np.signbit(lower_value)
+            lower = np.where(same_side, middle, lower)
+            lower_value = np.where(same_side, middle_value, lower_value)
+            upper = np.where(same_side, upper, middle)
+    return np.where(found, (lower + upper) / 2, np.nan)